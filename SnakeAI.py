@@ -3,6 +3,8 @@ import random
 from enum import Enum
 from collections import namedtuple
 import numpy as np
+from board import SnakeBody, BodyView
+from renderer import BoardRenderer
 
 pygame.init()
 
@@ -14,41 +16,116 @@ class Direction(Enum):
 
 Point = namedtuple('Point', 'x, y')
 
+# order the snake turns in, right turn = next, left turn = previous
+CLOCKWISE = [Direction.RIGHT, Direction.DOWN, Direction.LEFT, Direction.UP]
+CLOCKWISE_INDEX = {direction: i for i, direction in enumerate(CLOCKWISE)}
+# (row, col) step for each direction
+DIRECTION_DELTAS = {Direction.RIGHT: (0, 1), Direction.DOWN: (1, 0), Direction.LEFT: (0, -1), Direction.UP: (-1, 0)}
+
 class SnakeGameAI:
 
-    def __init__(self, width=1200, height=800):
+    # headless games never open a window, poll events, draw or sleep, so training runs as fast as the cpu allows
+    # a renderer can still be attached later with attach_renderer() to watch the run
+    # seed is the seed of the first game, see reset()
+    def __init__(self, width=1200, height=800, headless=False, fps=120, seed=None):
         self.WIDTH = width
         self.HEIGHT = height
         self.OFFSET = self.WIDTH - self.HEIGHT
         self.TILE_SIZE = 40
-        self.grid_list = [[x, y] for x in range(self.OFFSET, self.WIDTH, self.TILE_SIZE)
-                            for y in range(0, self.HEIGHT, self.TILE_SIZE)]
-
+        self.ROWS = self.HEIGHT // self.TILE_SIZE
+        self.COLS = (self.WIDTH - self.OFFSET) // self.TILE_SIZE
+        # body as a ring buffer of tile indices (row * COLS + col) with its occupancy grid
+        # self.snake is a read-only view of it, head first, and self.grid the shared occupancy grid
+        self.body = SnakeBody(self.ROWS, self.COLS)
+        self.snake = BodyView(self.body)
+        self.grid = self.body.grid
+        # far danger rays by heading, see DangerMap
+        self.rays = self.body.dangers.rays
+
+        self.headless = True
+        self.fps = fps
+        self.win = None
+        self.clock = None
+        self.renderer = None
+        if not headless:
+            self.attach_renderer(fps)
+        self.reset(seed)
+
+    def attach_renderer(self, fps=120):
+        # open the window and start drawing/ticking on every step
+        self.fps = fps
         self.win = pygame.display.set_mode((self.WIDTH, self.HEIGHT))
         pygame.display.set_caption('SnakeAI')
         self.clock = pygame.time.Clock()
-        self.reset()
+        self.renderer = BoardRenderer(self.win, self.WIDTH, self.HEIGHT, self.TILE_SIZE)
+        # the next frame draws the whole board
+        self.redraw = True
+        self.headless = False
+
+    def detach_renderer(self):
+        # go back to headless stepping, the window is closed
+        self.headless = True
+        self.win = None
+        self.clock = None
+        self.renderer = None
+        pygame.display.quit()
+
+    # seed picks where the food goes, a game played again with the same seed and the same moves
+    # is the same game (see recording.py), without one a seed is drawn from the random module
+    def reset(self, seed=None):
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.seed = seed
+        self.rng = random.Random(seed)
 
-    def reset(self):
         # init game state
         self.direction = Direction.RIGHT
-
-        self.head = Point(600, 200)
-        self.snake = [self.head]
+        # self.direction as its index in CLOCKWISE, kept next to it so the hot paths skip the enum lookup
+        self.heading = 0
+
+        # head is kept as a board row/column, starts at Point(600, 200)
+        self.head_row = 200 // self.TILE_SIZE
+        self.head_col = (600 - self.OFFSET) // self.TILE_SIZE
+        self.body.clear()
+        self.body.push_head(self.head_row * self.COLS + self.head_col)
+        # tile the tail left on the last step, None when the snake grew
+        self.vacated = None
+        self.redraw = True
 
         self.score = 0
+        # set when the snake fills the whole board
+        self.won = False
+        # why the game ended: 'wall', 'self' (ran into its body) or 'timeout' (too long without food), None otherwise
+        self.death_cause = None
         self.food = None
         self.place_food()
         self.frame_iteration = 0
 
+    # pixel position of the head, only built when something asks for it
+    @property
+    def head(self):
+        return Point(self.OFFSET + self.head_col * self.TILE_SIZE, self.head_row * self.TILE_SIZE)
+
+    # index of the tile at pixel position (x, y) in the occupancy grid
+    def tile_index(self, x, y):
+        return (y // self.TILE_SIZE) * self.COLS + (x - self.OFFSET) // self.TILE_SIZE
+
+    # pixel position of a tile index
+    def tile_point(self, tile):
+        row, col = divmod(tile, self.COLS)
+        return Point(self.OFFSET + col * self.TILE_SIZE, row * self.TILE_SIZE)
+
+    # put the apple on a random tile that is not part of the snake
+    # the body keeps an index of free tiles, so this is O(1) however full the board is
+    # returns False when there is no free tile left (the snake filled the board)
     def place_food(self):
-        # add snake body to set to know where not to place apple
-        snake_set = {(rect.x, rect.y) for rect in self.snake}
-        # keep choosing random choice for apple until not in snake body
-        x, y = random.choice(self.grid_list)
-        while (x, y) in snake_set:
-            x, y = random.choice(self.grid_list)
-        self.food = Point(x, y)
+        if not self.body.free:
+            self.food = None
+            return False
+        tile = self.body.free.sample(self.rng)
+        self.food = self.tile_point(tile)
+        self.food_row, self.food_col = divmod(tile, self.COLS)
+        return True
 
     # input: action
     # output: reward, game_over, score
@@ -56,158 +133,126 @@ class SnakeGameAI:
         self.frame_iteration += 1
 
         # 1. collect user input
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                quit()
+        if not self.headless:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    pygame.quit()
+                    quit()
 
         # 2. move
         self.move(action) # update the head
-        self.snake.insert(0, self.head)
 
         # 3. check if game over
+        # the new head only goes into the body once it is known to be safe
         reward = 0
         game_over = False
-        if self.is_collision() or self.frame_iteration > 100*len(self.snake):
+        if self.is_collision() or self.frame_iteration > 100*(len(self.snake) + 1):
             game_over = True
             reward = -10
+            row, col = self.head_row, self.head_col
+            if row < 0 or row >= self.ROWS or col < 0 or col >= self.COLS:
+                self.death_cause = 'wall'
+            elif self.grid[row * self.COLS + col] == 1:
+                self.death_cause = 'self'
+            else:
+                self.death_cause = 'timeout'
             return reward, game_over, self.score
+        self.body.push_head(self.head_row * self.COLS + self.head_col)
 
         # 4. place new food or just move
-        if self.head == self.food:
+        if self.head_row == self.food_row and self.head_col == self.food_col:
             self.score += 1
             reward = 10
-            self.place_food()
+            self.vacated = None
+            if not self.place_food():
+                # nowhere left to put food, the game is won
+                self.won = True
+                game_over = True
+                return reward, game_over, self.score
         else:
-            self.snake.pop()
+            self.vacated = self.body.pop_tail()
 
         # 5. update ui and clock
-        self.update_ui()
-        self.clock.tick(120)
+        if not self.headless:
+            self.update_ui()
+            self.clock.tick(self.fps)
         # 6. return game over and score
         return reward, game_over, self.score
 
     def is_collision(self, pt = None):
-        if pt == None:
-            pt = self.head
+        if pt is None:
+            return self.is_blocked(self.head_row, self.head_col)
+        return self.is_blocked(pt.y // self.TILE_SIZE, (pt.x - self.OFFSET) // self.TILE_SIZE)
+
+    # is_collision on board row/column, no Point needed
+    def is_blocked(self, row, col):
         # hits boundary
-        if pt.x > self.WIDTH - self.TILE_SIZE or pt.x < self.OFFSET or \
-           pt.y > self.HEIGHT - self.TILE_SIZE or pt.y < 0:
+        if row < 0 or row >= self.ROWS or col < 0 or col >= self.COLS:
             return True
         # hits itself
-        if pt in self.snake[1:]:
-            return True
-
-        return False
+        return self.grid[row * self.COLS + col] == 1
 
     # function that calculates which direction is the 'safest' by checking each square in each direction
     # returns[straight, right, left] and 1 means the direction that is the safest
     # ex: [1, 0, 0] means that right and left have closer dangers and snake should go straight
-    def calculate_far_dangers(self):
-        snake_set = {(rect.x, rect.y) for rect in self.snake}
-        head = self.snake[0]
-        direction = self.direction
-
-        if direction == Direction.LEFT:
-            straight_start, straight_end, straight_inc = head.x - self.TILE_SIZE, self.OFFSET, -self.TILE_SIZE
-            right_start, right_end, right_inc = head.y - self.TILE_SIZE, 0, -self.TILE_SIZE
-            left_start, left_end, left_inc = head.y + self.TILE_SIZE, self.HEIGHT, self.TILE_SIZE
-        elif direction == Direction.RIGHT:
-            straight_start, straight_end, straight_inc = head.x + self.TILE_SIZE, self.WIDTH, self.TILE_SIZE
-            right_start, right_end, right_inc = head.y + self.TILE_SIZE, self.HEIGHT, self.TILE_SIZE
-            left_start, left_end, left_inc = head.y - self.TILE_SIZE, 0, -self.TILE_SIZE
-        elif direction == Direction.UP:
-            straight_start, straight_end, straight_inc = head.y - self.TILE_SIZE, 0, -self.TILE_SIZE
-            right_start, right_end, right_inc = head.x + self.TILE_SIZE, self.WIDTH, self.TILE_SIZE
-            left_start, left_end, left_inc = head.x - self.TILE_SIZE, self.OFFSET, -self.TILE_SIZE
-        else:
-            straight_start, straight_end, straight_inc = head.y + self.TILE_SIZE, self.HEIGHT, self.TILE_SIZE
-            right_start, right_end, right_inc = head.x - self.TILE_SIZE, self.OFFSET, -self.TILE_SIZE
-            left_start, left_end, left_inc = head.x + self.TILE_SIZE, self.WIDTH, self.TILE_SIZE
-
-        # check straight
-        straight_count = 1
-        for straight in range(straight_start, straight_end, straight_inc):
-            # if we found a collision (body of snake) break and save count
-            if (straight, head.y) in snake_set:
-                break
-            straight_count += 1
-        # check right
-        right_count = 1
-        for right in range(right_start, right_end, right_inc):
-            if (head.x, right) in snake_set:
-                break
-            right_count += 1
-        # check left
-        left_count = 1
-        for left in range(left_start, left_end, left_inc):
-            if (head.x, left) in snake_set:
-                break
-            left_count += 1
-        divisor = max(straight_count, right_count, left_count)
-
-        return straight_count // divisor, right_count // divisor, left_count // divisor
-
-    def draw_grid(self):
-        for x in range(self.OFFSET, self.WIDTH, self.TILE_SIZE):
-            pygame.draw.line(self.win, (50, 50, 50), (x, 0), (x, self.HEIGHT))
-            pygame.draw.line(self.win, (50, 50, 50), (self.OFFSET, x - self.OFFSET), (self.WIDTH, x - self.OFFSET))
-        # draw first red line
-        pygame.draw.line(self.win, (255, 0, 0), (self.OFFSET, 0), (self.OFFSET, self.HEIGHT))
-
-    def draw_name(self):
-        name_font = pygame.font.Font('Snake Chan.otf', 80)
-        name_text = name_font.render("Snake", True, (0, 255, 0))
-        self.win.blit(name_text, [40, 50])
-
-    def draw_score(self):
-        score_font = pygame.font.Font('Azonix.otf', 45)
-        score_text = score_font.render(f"Score: {len(self.snake) - 1}", True, (255, 255, 255))
-        self.win.blit(score_text, [70, 160])
-
+    # counts can be passed in when far_danger_counts() was already called for this step
+    def calculate_far_dangers(self, counts=None):
+        straight, right, left = counts or self.far_danger_counts()
+
+        # True (1) for the longest ray(s), comparisons are cheaper than dividing by the longest
+        return straight >= right and straight >= left, right >= straight and right >= left, \
+            left >= straight and left >= right
+
+    # same as calculate_far_dangers but keeps the actual distances, scaled to (0, 1] by the board size
+    def far_danger_distances(self, counts=None):
+        size = max(self.ROWS, self.COLS)
+        straight_count, right_count, left_count = counts or self.far_danger_counts()
+
+        return straight_count / size, right_count / size, left_count / size
+
+    # tiles to the nearest wall or body part going straight, right and left from the head
+    # the body keeps a per row/column danger map up to date on every move, so each ray is O(1)
+    def far_danger_counts(self):
+        row, col = self.head_row, self.head_col
+        # after running into a wall the head is off the board and there is nowhere left to go
+        if not (0 <= row < self.ROWS and 0 <= col < self.COLS):
+            return 1, 1, 1
+        return self.rays[self.heading](row, col)
+
+    # draws what changed since the last step: the new head, the tile the tail left, the food and the score
+    # the whole board is only drawn for the first frame of a game
     def update_ui(self):
-        self.win.fill('black')
-
-        # draw UI
-        self.draw_name()
-        self.draw_score()
-
-        # draw snake
-        for pt in self.snake:
-            pygame.draw.rect(self.win, 'green', pygame.Rect(pt.x, pt.y, self.TILE_SIZE, self.TILE_SIZE))
-
-        # draw food
-        pygame.draw.rect(self.win, 'red', pygame.Rect(self.food.x, self.food.y, self.TILE_SIZE, self.TILE_SIZE))
-        self.draw_grid()
-
-        pygame.display.flip()
+        renderer = self.renderer
+        if self.redraw:
+            renderer.draw_background()
+            renderer.draw_food(*self.food)
+            for tile in self.snake:
+                renderer.draw_tile(*self.tile_point(tile), 'green')
+            self.redraw = False
+        else:
+            # food first, when it was eaten the new head covers the tile it left
+            renderer.draw_food(*self.food)
+            if self.vacated is not None:
+                renderer.clear_tile(*self.tile_point(self.vacated))
+            renderer.draw_tile(*self.head, 'green')
+        renderer.draw_score(len(self.snake) - 1)
+        renderer.present()
 
     def move(self, action):
         # [straight, right, left]
 
-        clockwise = [Direction.RIGHT, Direction.DOWN, Direction.LEFT, Direction.UP]
-        idx = clockwise.index(self.direction)
+        idx = self.heading
 
         if np.array_equal(action, [1, 0, 0]):
-            new_dir = clockwise[idx]
+            next_idx = idx
         elif np.array_equal(action, [0, 1, 0]):
             next_idx = (idx + 1) % 4
-            new_dir = clockwise[next_idx]
         else: # [0, 0, 1]
             next_idx = (idx - 1) % 4
-            new_dir = clockwise[next_idx]
-
-        self.direction = new_dir
-
-        x = self.head.x
-        y = self.head.y
-        if self.direction == Direction.RIGHT:
-            x += self.TILE_SIZE
-        elif self.direction == Direction.LEFT:
-            x -= self.TILE_SIZE
-        elif self.direction == Direction.DOWN:
-            y += self.TILE_SIZE
-        elif self.direction == Direction.UP:
-            y -= self.TILE_SIZE
-
-        self.head = Point(x, y)
\ No newline at end of file
+
+        self.heading = next_idx
+        self.direction = CLOCKWISE[next_idx]
+
+        d_row, d_col = DIRECTION_DELTAS[self.direction]
+        self.head_row += d_row
+        self.head_col += d_col
@@ -0,0 +1,211 @@
+import numpy as np
+from seeding import RunSeeds, new_seed
+
+# clockwise order used by SnakeGameAI.move: RIGHT, DOWN, LEFT, UP
+# row/col deltas for each direction index
+DELTA_ROW = np.array([0, 1, 0, -1], dtype=np.int64)
+DELTA_COL = np.array([1, 0, -1, 0], dtype=np.int64)
+# action index -> turn: [straight, right, left]
+TURN = np.array([0, 1, -1], dtype=np.int64)
+
+
+# N snake boards stepped in lockstep with numpy
+# every board follows the same rules as SnakeGameAI, everything is kept in tile coordinates:
+#   head_row/head_col (N,), direction (N,) as clockwise index, food (N,) as tile index,
+#   occupancy (N, rows, cols) and the body as a ring buffer of tile indices per board
+# every game gets its own food generator from the next game seed of the run seed (see seeding.py),
+# so a board's game never depends on what the other boards did and can be played again from game_seeds[i]
+class BatchSnakeGameAI:
+
+    # far_danger_distances gives float states with the scaled distances, like SnakeGameAI.far_danger_distances
+    def __init__(self, num_games, width=1200, height=800, far_dangers=True, far_danger_distances=False, seed=None):
+        self.WIDTH = width
+        self.HEIGHT = height
+        self.OFFSET = self.WIDTH - self.HEIGHT
+        self.TILE_SIZE = 40
+        self.ROWS = self.HEIGHT // self.TILE_SIZE
+        self.COLS = (self.WIDTH - self.OFFSET) // self.TILE_SIZE
+        self.AREA = self.ROWS * self.COLS
+        # same starting tile as SnakeGameAI.reset: Point(600, 200)
+        self.START_ROW = 200 // self.TILE_SIZE
+        self.START_COL = (600 - self.OFFSET) // self.TILE_SIZE
+
+        self.num_games = num_games
+        self.far_dangers = far_dangers
+        self.far_danger_distances = far_danger_distances
+        self.state_size = 14 if far_dangers else 11
+        self.seeds = RunSeeds(seed if seed is not None else new_seed())
+        # games started so far, the next game plays on game seed number_of_games
+        self.number_of_games = 0
+
+        n = num_games
+        self.head_row = np.zeros(n, dtype=np.int64)
+        self.head_col = np.zeros(n, dtype=np.int64)
+        self.direction = np.zeros(n, dtype=np.int64)
+        self.food = np.zeros(n, dtype=np.int64)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.frame_iteration = np.zeros(n, dtype=np.int64)
+        self.occupancy = np.zeros((n, self.ROWS, self.COLS), dtype=np.uint8)
+        # flat view used for tile-index lookups
+        self.occupancy_flat = self.occupancy.reshape(n, self.AREA)
+        # body ring buffer: body[i, body_start[i]] is the head, the tail is length-1 slots further
+        self.body = np.zeros((n, self.AREA), dtype=np.int64)
+        self.body_start = np.zeros(n, dtype=np.int64)
+        self.length = np.zeros(n, dtype=np.int64)
+        self.boards = np.arange(n)
+        # seed and food generator of the game each board is playing
+        self.game_seeds = np.zeros(n, dtype=np.uint64)
+        self.rngs = [None] * n
+        # step counts along a far-danger ray
+        self.RAY = np.arange(1, max(self.ROWS, self.COLS) + 1)
+
+        self.reset()
+
+    # reset all boards, or only the boards where mask is True
+    # returns the stacked states of all boards
+    def reset(self, mask=None):
+        idx = self.boards if mask is None else np.flatnonzero(mask)
+        if len(idx):
+            for i in idx:
+                self.game_seeds[i] = self.seeds.game_seed(self.number_of_games)
+                self.rngs[i] = np.random.default_rng(int(self.game_seeds[i]))
+                self.number_of_games += 1
+            self.occupancy[idx] = 0
+            self.direction[idx] = 0
+            self.head_row[idx] = self.START_ROW
+            self.head_col[idx] = self.START_COL
+            head = self.START_ROW * self.COLS + self.START_COL
+            self.body_start[idx] = 0
+            self.body[idx, 0] = head
+            self.length[idx] = 1
+            self.occupancy_flat[idx, head] = 1
+            self.score[idx] = 0
+            self.frame_iteration[idx] = 0
+            self.place_food(idx)
+        return self.get_states()
+
+    # place food on a free tile for each board in idx
+    # returns a mask over idx of boards that had no free tile left (board is full)
+    # each board draws from its own generator, only boards that just reset or ate get here
+    def place_food(self, idx):
+        full = np.zeros(len(idx), dtype=bool)
+        for j, i in enumerate(idx):
+            rng, occupied = self.rngs[i], self.occupancy_flat[i]
+            # rejection sampling almost always finishes in a try or two
+            for _ in range(8):
+                pick = rng.integers(self.AREA)
+                if not occupied[pick]:
+                    self.food[i] = pick
+                    break
+            else:
+                # crowded board: pick straight from the list of free tiles
+                free_tiles = np.flatnonzero(occupied == 0)
+                if len(free_tiles):
+                    self.food[i] = free_tiles[rng.integers(len(free_tiles))]
+                else:
+                    full[j] = True
+        return full
+
+    # input: actions as (N,) indices [straight, right, left] or (N, 3) one-hot moves
+    # output: rewards, dones, scores and states, all stacked over the N boards
+    # boards that finished are reset before returning, so their state is the first state of the next game
+    # the returned scores are the final scores of the finished games
+    def step(self, actions):
+        actions = np.asarray(actions)
+        if actions.ndim == 2:
+            actions = actions.argmax(axis=1)
+
+        self.frame_iteration += 1
+        self.direction = (self.direction + TURN[actions]) % 4
+        row = self.head_row + DELTA_ROW[self.direction]
+        col = self.head_col + DELTA_COL[self.direction]
+
+        # 1. check if game over: wall, body (the tail has not moved yet) or taking too long
+        out = (row < 0) | (row >= self.ROWS) | (col < 0) | (col >= self.COLS)
+        tile = np.clip(row, 0, self.ROWS - 1) * self.COLS + np.clip(col, 0, self.COLS - 1)
+        hit_self = (self.occupancy_flat[self.boards, tile] == 1) & ~out
+        timeout = self.frame_iteration > 100 * (self.length + 1)
+        dones = out | hit_self | timeout
+
+        rewards = np.zeros(self.num_games, dtype=np.float32)
+        rewards[dones] = -10
+
+        # 2. move: push the new head on every live board
+        alive = np.flatnonzero(~dones)
+        self.head_row[alive] = row[alive]
+        self.head_col[alive] = col[alive]
+        self.body_start[alive] = (self.body_start[alive] - 1) % self.AREA
+        self.body[alive, self.body_start[alive]] = tile[alive]
+        self.occupancy_flat[alive, tile[alive]] = 1
+        self.length[alive] += 1
+
+        # 3. place new food or just move
+        ate = tile[alive] == self.food[alive]
+        eaters = alive[ate]
+        movers = alive[~ate]
+        tail = self.body[movers, (self.body_start[movers] + self.length[movers] - 1) % self.AREA]
+        self.occupancy_flat[movers, tail] = 0
+        self.length[movers] -= 1
+
+        if len(eaters):
+            self.score[eaters] += 1
+            rewards[eaters] = 10
+            # a full board is a won game
+            dones[eaters[self.place_food(eaters)]] = True
+
+        scores = self.score.copy()
+        if dones.any():
+            self.reset(dones)
+        return rewards, dones, scores, self.get_states()
+
+    # stacked 11 (or 14 with far dangers) feature states, same layout as Agent.get_state
+    def get_states(self):
+        dtype = np.float32 if self.far_danger_distances else np.uint8
+        states = np.zeros((self.num_games, self.state_size), dtype=dtype)
+        head_row, head_col, direction = self.head_row, self.head_col, self.direction
+
+        # danger straight, right, left
+        for i, turn in enumerate(TURN):
+            d = (direction + turn) % 4
+            states[:, i] = self.is_blocked(head_row + DELTA_ROW[d], head_col + DELTA_COL[d])
+
+        # move direction: left, right, up, down
+        states[:, 3] = direction == 2
+        states[:, 4] = direction == 0
+        states[:, 5] = direction == 3
+        states[:, 6] = direction == 1
+
+        # food left, right, up, down
+        food_row, food_col = np.divmod(self.food, self.COLS)
+        states[:, 7] = head_col > food_col
+        states[:, 8] = head_col < food_col
+        states[:, 9] = head_row > food_row
+        states[:, 10] = head_row < food_row
+
+        if self.far_dangers:
+            counts = self.calculate_far_dangers()
+            if self.far_danger_distances:
+                states[:, 11:14] = counts / max(self.ROWS, self.COLS)
+            else:
+                states[:, 11:14] = counts // counts.max(axis=1, keepdims=True)
+        return states
+
+    # True where (row, col) is off the board or inside a snake
+    # works on (N,) positions or (N, k) rays of positions
+    def is_blocked(self, row, col):
+        out = (row < 0) | (row >= self.ROWS) | (col < 0) | (col >= self.COLS)
+        tile = np.clip(row, 0, self.ROWS - 1) * self.COLS + np.clip(col, 0, self.COLS - 1)
+        boards = self.boards if tile.ndim == 1 else self.boards[:, None]
+        return out | (self.occupancy_flat[boards, tile] == 1)
+
+    # (N, 3) tiles until the nearest wall or body part going straight, right and left from the head
+    # same counting as SnakeGameAI.calculate_far_dangers
+    def calculate_far_dangers(self):
+        counts = np.zeros((self.num_games, 3), dtype=np.int64)
+        for i, turn in enumerate(TURN):
+            d = (self.direction + turn) % 4
+            # every tile on the ray at once, (N, steps); the last step is always off the board
+            rows = self.head_row[:, None] + self.RAY * DELTA_ROW[d][:, None]
+            cols = self.head_col[:, None] + self.RAY * DELTA_COL[d][:, None]
+            counts[:, i] = self.is_blocked(rows, cols).argmax(axis=1) + 1
+        return counts
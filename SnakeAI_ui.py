@@ -2,6 +2,7 @@ import pygame
 import random
 from enum import Enum
 from collections import namedtuple
+from renderer import BoardRenderer
 
 pygame.init()
 
@@ -28,6 +29,7 @@ class SnakeGame:
         self.win = pygame.display.set_mode((self.WIDTH, self.HEIGHT))
         pygame.display.set_caption('SnakeAI')
         self.clock = pygame.time.Clock()
+        self.renderer = BoardRenderer(self.win, self.WIDTH, self.HEIGHT, self.TILE_SIZE)
         self.directions = {pygame.K_UP: 1, pygame.K_DOWN: 1, pygame.K_LEFT: 1, pygame.K_RIGHT: 1}
         self.start()
 
@@ -37,6 +39,9 @@ class SnakeGame:
 
         self.head = Point(600, 200)
         self.snake = [self.head]
+        # tile the tail left on the last step, and whether the next frame draws the whole board
+        self.vacated = None
+        self.redraw = True
 
         self.score = 0
         self.food = None
@@ -90,9 +95,10 @@ class SnakeGame:
         # 4. place new food or just move
         if self.head == self.food:
             self.score += 1
+            self.vacated = None
             self.place_food()
         else:
-            self.snake.pop()
+            self.vacated = self.snake.pop()
 
         print(self.frame_iteration)
         print(self.calculate_far_dangers())
@@ -161,39 +167,23 @@ class SnakeGame:
 
         return straight_count // divisor, right_count // divisor, left_count // divisor
 
-    def draw_grid(self):
-        for x in range(self.OFFSET, self.WIDTH, self.TILE_SIZE):
-            pygame.draw.line(self.win, (50, 50, 50), (x, 0), (x, self.HEIGHT))
-            pygame.draw.line(self.win, (50, 50, 50), (self.OFFSET, x - self.OFFSET), (self.WIDTH, x - self.OFFSET))
-        # draw first red line
-        pygame.draw.line(self.win, (255, 0, 0), (self.OFFSET, 0), (self.OFFSET, self.HEIGHT))
-
-    def draw_name(self):
-        name_font = pygame.font.Font('Snake Chan.otf', 80)
-        name_text = name_font.render("Snake", True, (0, 255, 0))
-        self.win.blit(name_text, [40, 50])
-
-    def draw_score(self):
-        score_font = pygame.font.Font('Azonix.otf', 45)
-        score_text = score_font.render(f"Score: {len(self.snake)}", True, (255, 255, 255))
-        self.win.blit(score_text, [70, 160])
-
+    # draws what changed since the last step: the new head, the tile the tail left, the food and the score
     def update_ui(self):
-        self.win.fill('black')
-
-        # draw UI
-        self.draw_name()
-        self.draw_score()
-
-        # draw snake
-        for pt in self.snake:
-            pygame.draw.rect(self.win, 'green', pygame.Rect(pt.x, pt.y, self.TILE_SIZE, self.TILE_SIZE))
-
-        # draw food
-        pygame.draw.rect(self.win, 'red', pygame.Rect(self.food.x, self.food.y, self.TILE_SIZE, self.TILE_SIZE))
-        self.draw_grid()
-
-        pygame.display.flip()
+        renderer = self.renderer
+        if self.redraw:
+            renderer.draw_background()
+            renderer.draw_food(*self.food)
+            for pt in self.snake:
+                renderer.draw_tile(pt.x, pt.y, 'green')
+            self.redraw = False
+        else:
+            # food first, when it was eaten the new head covers the tile it left
+            renderer.draw_food(*self.food)
+            if self.vacated is not None:
+                renderer.clear_tile(*self.vacated)
+            renderer.draw_tile(*self.head, 'green')
+        renderer.draw_score(len(self.snake))
+        renderer.present()
 
     def _move(self, direction):
         x = self.head.x
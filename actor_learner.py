@@ -0,0 +1,186 @@
+import os
+import queue
+import time
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+from dataclasses import replace
+from agent import Agent, default_config
+from checkpoint import CheckpointManager
+from model import Linear_QNet
+from SnakeAI import SnakeGameAI
+
+# transitions an actor collects before sending them to the learner
+CHUNK_SIZE = 500
+# model, checkpoints and replay memory of the learner, apart from train()'s model folder
+PARALLEL_FOLDER = os.path.join('model', 'parallel')
+# long memory updates between two weight publishes
+PUBLISH_EVERY = 10
+# transitions the learner takes in per long memory update
+TRAIN_EVERY = 1000
+
+
+# actor process: plays its own headless game with a copy of the model and sends transitions to the learner
+# weights are read from shared_model whenever the learner bumped version
+# the actor's exploration and its games come from its own streams of the run seed in config (worker worker_id + 1),
+# its n-th game is always played on the same seed
+def run_actor(worker_id, transitions, shared_model, version, lock, games, stop, config):
+    # every actor gets one core, the learner and the other actors have the rest
+    torch.set_num_threads(1)
+
+    agent = Agent(persistent=False, config=config, worker=worker_id + 1)
+    # games played by this actor
+    episode = 0
+    game = SnakeGameAI(headless=True, seed=agent.seeds.game_seed(episode))
+    local_version = -1
+
+    states, actions, rewards, states_new, games_over, scores = [], [], [], [], [], []
+    state_old = agent.get_state(game)
+    while not stop.is_set():
+        if version.value != local_version:
+            with lock:
+                agent.model.load_state_dict(shared_model.state_dict())
+                local_version = version.value
+
+        # exploration follows the number of games played by all actors
+        agent.number_of_games = games.value
+        action = agent.get_action(state_old)
+        state_new, reward, done, score = agent.play_step(game, action)
+
+        states.append(state_old)
+        actions.append(action.index(1))
+        rewards.append(reward)
+        states_new.append(state_new)
+        games_over.append(done)
+
+        if done:
+            episode += 1
+            game.reset(agent.seeds.game_seed(episode))
+            state_new = agent.get_state(game)
+            scores.append(score)
+            with games.get_lock():
+                games.value += 1
+        state_old = state_new
+
+        if len(actions) == CHUNK_SIZE:
+            # as tensors, the queue moves them into shared memory and only passes handles to the learner
+            # instead of pickling the transitions through the pipe
+            chunk = (torch.from_numpy(np.array(states)), torch.from_numpy(np.array(actions)),
+                     torch.from_numpy(np.array(rewards, dtype=np.float32)), torch.from_numpy(np.array(states_new)),
+                     torch.from_numpy(np.array(games_over)), scores)
+            # wait for room in the queue, but don't hang once the learner is done
+            while not stop.is_set():
+                try:
+                    transitions.put(chunk, timeout=1)
+                    break
+                except queue.Full:
+                    pass
+            states, actions, rewards, states_new, games_over, scores = [], [], [], [], [], []
+
+
+# copy the learner's weights into shared memory and tell the actors
+def publish(model, shared_model, version, lock):
+    with lock:
+        shared_model.load_state_dict(model.state_dict())
+        version.value += 1
+
+
+# actor/learner training: num_actors processes play and collect transitions, this process owns the
+# model and trainer, fills the replay memory and trains on it, and publishes weights every PUBLISH_EVERY updates
+# stops after `number_of_games` games have been played by all actors together
+# seed is the run seed of the learner and all actors (see seeding.py), None picks a new one
+# folder keeps the learner's model.pth, checkpoints and replay memory, every call is a fresh run there
+def train_parallel(num_actors=None, number_of_games=400, seed=None, folder=PARALLEL_FOLDER):
+    if num_actors is None:
+        num_actors = max(1, (os.cpu_count() or 2) - 1)
+
+    checkpoints = CheckpointManager(os.path.join(folder, 'checkpoints'),
+                                    best_model_path=os.path.join(folder, 'model.pth'))
+    checkpoints.archive()
+    context = mp.get_context('spawn')
+    learner = Agent(config=replace(default_config(), seed=seed), folder=folder)
+    shared_model = Linear_QNet(learner.input_layer, learner.hidden_layers, 3)
+    shared_model.load_state_dict(learner.model.state_dict())
+    shared_model.share_memory()
+
+    transitions = context.Queue(maxsize=4 * num_actors)
+    version = context.Value('i', 0)
+    games = context.Value('i', 0)
+    lock = context.Lock()
+    stop = context.Event()
+
+    actors = [context.Process(target=run_actor,
+                              args=(i, transitions, shared_model, version, lock, games, stop, learner.config),
+                              daemon=True)
+              for i in range(num_actors)]
+    for actor in actors:
+        actor.start()
+
+    score_list = []
+    highscore = 0
+    updates = 0
+    pending = 0
+    steps = 0
+    start = time.perf_counter()
+    try:
+        while len(score_list) < number_of_games:
+            try:
+                chunks = [transitions.get(timeout=1)]
+            except queue.Empty:
+                continue
+            # take everything that is already waiting, so a learner that falls behind
+            # trains less often per transition instead of stalling the actors
+            while True:
+                try:
+                    chunks.append(transitions.get_nowait())
+                except queue.Empty:
+                    break
+
+            scores = []
+            for states, actions, rewards, states_new, games_over, chunk_scores in chunks:
+                learner.memory.extend(states.numpy(), actions.numpy(), rewards.numpy(), states_new.numpy(),
+                                      games_over.numpy())
+                steps += len(actions)
+                pending += len(actions)
+                scores += chunk_scores
+
+            for score in scores:
+                score_list.append(score)
+                if score > highscore:
+                    highscore = score
+                    learner.number_of_games = games.value
+                    # the epsilon the actors explore with at this point
+                    learner.update_epsilon()
+                    learner.checkpoint(checkpoints, score, best=True)
+
+            if pending >= TRAIN_EVERY:
+                pending = 0
+                learner.number_of_games = games.value
+                learner.train_long_memory()
+                updates += 1
+                if updates % PUBLISH_EVERY == 0:
+                    publish(learner.model, shared_model, version, lock)
+
+            if scores:
+                mean_score = sum(score_list) / len(score_list)
+                print(f'Game #{len(score_list)} Mean Score: {mean_score} Highscore: {highscore} '
+                      f'Steps/s: {steps / (time.perf_counter() - start):.0f}')
+    finally:
+        stop.set()
+        # actors may be waiting on a full queue
+        # chunks of an actor that already exited can't be mapped any more, they are dropped anyway
+        while any(actor.is_alive() for actor in actors):
+            try:
+                transitions.get(timeout=0.1)
+            except (queue.Empty, OSError):
+                pass
+        for actor in actors:
+            actor.join()
+        checkpoints.close()
+        learner.memory.flush()
+
+    return score_list, steps / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    train_parallel()
@@ -1,10 +1,19 @@
+import os
+import sys
+import time
 import torch
-import random
 import numpy as np
-from collections import deque
-from SnakeAI import SnakeGameAI, Direction, Point
+from dataclasses import dataclass, asdict, replace
+from SnakeAI import SnakeGameAI
 from model import Linear_QNet, QTrainer
-from helper import plot, annotate
+from replay import ReplayMemory, PrioritizedReplayMemory
+from checkpoint import CheckpointManager
+from results import ResultsStore
+from metrics import MetricsWriter, LivePlot
+from profiling import TrainingProfiler, rss_bytes
+from spectator import Spectator
+from recording import EpisodeWriter
+from seeding import RunSeeds, new_seed, AGENT, MEMORY, MODEL
 
 #
 MAX_MEMORY = 5000000
@@ -26,20 +35,132 @@ min_exploration_rate = 0.0001
 exploration_decay_rate = 0.03
 
 far_dangers = True
+
+# sample the long memory by TD error instead of uniformly
+prioritized_replay = False
+# how much the TD error matters, 0 is uniform sampling
+priority_alpha = 0.6
+# importance-sampling correction, grows to 1 (full correction) as training goes on
+priority_beta = 0.4
+# use the actual far danger distances (floats in (0, 1]) instead of 1 for the safest direction(s)
+far_danger_distances = False
+
+# headless training never opens a window or sleeps between steps
+headless = True
+
+# games between two regular checkpoints, new highscores are always checkpointed
+CHECKPOINT_EVERY = 25
+# checkpoints kept: the most recent ones and the highest scoring ones
+KEEP_LAST_CHECKPOINTS = 3
+KEEP_BEST_CHECKPOINTS = 3
+
+# games in a training run
+MAX_GAMES = 400
+
+# folder of a run's model.pth, checkpoints, replay memory and metrics, train() takes another one per run
+MODEL_FOLDER = 'model'
+# keep the replay memory in memory-mapped files, so train(resume=True) can reopen it instead of starting empty
+persistent_memory = True
+# replay memory files, inside the run's folder
+REPLAY_FOLDER = 'replay'
+
+# one record per game (score, mean score, epsilon, steps, loss, time) appended by a background thread
+# .jsonl or .csv inside the run's folder, `python metrics.py model/metrics.jsonl` plots a run from another terminal
+METRICS_FILE = 'metrics.jsonl'
+# plot the scores live in a separate process, redrawn at most once a second
+live_plot = False
+# games between two progress lines on the console
+PRINT_EVERY = 10
+
+# keep every game (seed and moves, a few hundred bytes) in the run's episodes.bin/.idx,
+# `python recording.py model/episodes best` replays the highest scoring one
+record_games = True
+EPISODES_FILE = 'episodes'
+
+# watch headless training in a window of its own (see spectator.py): every SPECTATE_EVERY-th game (0 for none)
+# and/or every new highscore game, replayed at SPECTATOR_FPS
+spectate = False
+SPECTATE_EVERY = 0
+SPECTATE_HIGHSCORES = True
+SPECTATOR_FPS = 30
+
+# every PROFILE_EVERY-th game is timed phase by phase (get_action, play_step, get_state, training, checkpoints)
+# and its metrics record gets the time_<phase> seconds, the replay memory size and the process memory
+PROFILE_EVERY = 10
+# games profiled with cProfile after `kill -USR1 <pid>`, written to profiles/ in the run's folder
+PROFILE_GAMES = 20
+
+# hyperparameters of one training run, the field names are the ones recorded in the results store
+# Config() takes the settings above as they were at import, default_config() as they are now
+# e.g. Agent(config=replace(default_config(), LEARNING_RATE=0.002))
+@dataclass
+class Config:
+    MAX_MEMORY: int = MAX_MEMORY
+    BATCH_SIZE: int = BATCH_SIZE
+    LEARNING_RATE: float = LEARNING_RATE
+    max_exploration_rate: float = max_exploration_rate
+    min_exploration_rate: float = min_exploration_rate
+    exploration_decay_rate: float = exploration_decay_rate
+    # discount rate
+    gamma: float = 0.8
+    # size of the hidden layer
+    hidden_layers: int = 1000
+    far_dangers: bool = far_dangers
+    far_danger_distances: bool = far_danger_distances
+    prioritized_replay: bool = prioritized_replay
+    priority_alpha: float = priority_alpha
+    priority_beta: float = priority_beta
+    max_games: int = MAX_GAMES
+    # run seed every random number of the run comes from (see seeding.py), None picks a new one
+    seed: int = None
+
+def default_config():
+    return Config(MAX_MEMORY=MAX_MEMORY, BATCH_SIZE=BATCH_SIZE, LEARNING_RATE=LEARNING_RATE,
+                  max_exploration_rate=max_exploration_rate, min_exploration_rate=min_exploration_rate,
+                  exploration_decay_rate=exploration_decay_rate, far_dangers=far_dangers,
+                  far_danger_distances=far_danger_distances, prioritized_replay=prioritized_replay,
+                  priority_alpha=priority_alpha, priority_beta=priority_beta, max_games=MAX_GAMES)
+
 class Agent:
 
-    def __init__(self):
+    # resume=True reopens the replay memory files left by an earlier run
+    # persistent overrides persistent_memory, e.g. actors that never train keep no memory files
+    # config defaults to default_config(), folder is where the replay memory files go
+    # worker picks this agent's random streams of the run seed, 0 for train() and the learner, 1, 2, ... for actors
+    def __init__(self, resume=False, persistent=None, config=None, folder=MODEL_FOLDER, worker=0):
+        config = config if config is not None else default_config()
+        if config.seed is None:
+            # the seed is part of the config, so it is in the results store and a run can be repeated
+            config = replace(config, seed=new_seed())
+        self.config = config
+        self.seeds = RunSeeds(config.seed, worker)
         self.number_of_games = 0
+        # random numbers for action selection
+        self.rng = self.seeds.generator(AGENT)
         # parameter to control randomness
         self.epsilon = 1
         # discount rate
-        self.gamma = 0.8
-        self.memory = deque(maxlen=MAX_MEMORY)
+        self.gamma = config.gamma
         # model takes 11 states, one hidden layer, and 3 for output because 3 different numbers in action
-        self.hidden_layers = 1000
-        self.input_layer = 14 if far_dangers else 11
-        self.model = Linear_QNet(self.input_layer, self.hidden_layers, 3)
-        self.trainer = QTrainer(self.model, learning_rate= LEARNING_RATE, gamma=self.gamma)
+        self.hidden_layers = config.hidden_layers
+        self.input_layer = 14 if config.far_dangers else 11
+        # states are 0/1 features unless the far danger distances are used
+        state_dtype = np.float32 if config.far_danger_distances else np.uint8
+        if persistent is None:
+            persistent = persistent_memory
+        memory_path = os.path.join(folder, REPLAY_FOLDER) if persistent else None
+        if config.prioritized_replay:
+            self.memory = PrioritizedReplayMemory(config.MAX_MEMORY, self.input_layer, state_dtype,
+                                                  alpha=config.priority_alpha, beta=config.priority_beta,
+                                                  seed=self.seeds.sequence(MEMORY), path=memory_path, resume=resume)
+        else:
+            self.memory = ReplayMemory(config.MAX_MEMORY, self.input_layer, state_dtype,
+                                       seed=self.seeds.sequence(MEMORY), path=memory_path, resume=resume)
+        # the initial weights come from the run seed too, without touching torch's global generator
+        with torch.random.fork_rng(devices=[]):
+            torch.manual_seed(self.seeds.int_seed(MODEL))
+            self.model = Linear_QNet(self.input_layer, self.hidden_layers, 3)
+        self.trainer = QTrainer(self.model, learning_rate=config.LEARNING_RATE, gamma=self.gamma)
 
     # storing 11 states
     '''
@@ -49,157 +170,345 @@ class Agent:
     '''
     def get_state(self, game):
         # grab head of snake
-        head = game.snake[0]
+        row, col = game.head_row, game.head_col
+        far_dangers, far_danger_distances = self.config.far_dangers, self.config.far_danger_distances
 
-        # check points around head
-        point_l = Point(head.x - game.TILE_SIZE, head.y)
-        point_r = Point(head.x + game.TILE_SIZE, head.y)
-        point_u = Point(head.x, head.y - game.TILE_SIZE)
-        point_d = Point(head.x, head.y + game.TILE_SIZE)
+        # check which direction the snake is going in, from its clockwise index (right, down, left, up)
+        # comparing ints is much cheaper than comparing Direction members
+        heading = game.heading
+        dir_r, dir_d, dir_l, dir_u = heading == 0, heading == 1, heading == 2, heading == 3
 
-        # check which direction the snake is going in
-        dir_l = game.direction == Direction.LEFT
-        dir_r = game.direction == Direction.RIGHT
-        dir_u = game.direction == Direction.UP
-        dir_d = game.direction == Direction.DOWN
+        # food location: left, right, up, down
+        food_l, food_r = col > game.food_col, col < game.food_col
+        food_u, food_d = row > game.food_row, row < game.food_row
 
         # calculate far dangers
-        if far_dangers: 
-            far_danger_straight, far_danger_right, far_danger_left = game.calculate_far_dangers()
-        
-        # create list for 11 states to then return the 14 sized array
-
-        state = [
-            # Danger Straight
-            (dir_l and game.is_collision(point_l)) or
-            (dir_r and game.is_collision(point_r)) or
-            (dir_u and game.is_collision(point_u)) or
-            (dir_d and game.is_collision(point_d)),
-
-            # Danger right
-            (dir_l and game.is_collision(point_u)) or
-            (dir_r and game.is_collision(point_d)) or
-            (dir_u and game.is_collision(point_r)) or
-            (dir_d and game.is_collision(point_l)),
-
-            # Danger left
-            (dir_l and game.is_collision(point_d)) or
-            (dir_r and game.is_collision(point_u)) or
-            (dir_u and game.is_collision(point_l)) or
-            (dir_d and game.is_collision(point_r)),
-
-            # Move Direction
-            dir_l, dir_r, dir_u, dir_d,
-
-            # Food location
-            # food left:
-            game.head.x > game.food.x,
-            # food right:
-            game.head.x < game.food.x,
-            # food up
-            game.head.y > game.food.y,
-            # food down
-            game.head.y < game.food.y
-        ]
-        # Far Dangers
+        # the rays also say whether the next tile is blocked (distance 1), so the close dangers come for free
+        # and this costs no more than the 11 state checks below
         if far_dangers:
-            state.append(far_danger_straight, far_danger_right, far_danger_left)
-
-        # turn list to array since there are true or false inside, will be converted to int
-        return np.array(state, dtype=int)
+            # game.far_danger_counts inline, the head is only off the board once the game ended at a wall
+            if game.death_cause != 'wall':
+                straight, right, left = game.rays[heading](row, col)
+            else:
+                straight = right = left = 1
+            if far_danger_distances:
+                far_straight, far_right, far_left = game.far_danger_distances((straight, right, left))
+                return np.array((straight == 1, right == 1, left == 1, dir_l, dir_r, dir_u, dir_d,
+                                 food_l, food_r, food_u, food_d, far_straight, far_right, far_left), dtype=float)
+            # game.calculate_far_dangers inline: 1 for the longest ray(s), 0 for the others
+            far_straight = straight >= right and straight >= left
+            far_right = right >= straight and right >= left
+            far_left = left >= straight and left >= right
+            return np.frombuffer(bytearray((straight == 1, right == 1, left == 1, dir_l, dir_r, dir_u, dir_d,
+                                            food_l, food_r, food_u, food_d, far_straight, far_right, far_left)),
+                                 np.uint8)
+
+        # check the tiles around the head: left (col - 1), right (col + 1), up (row - 1), down (row + 1)
+        danger_straight = (dir_l and game.is_blocked(row, col - 1)) or \
+                          (dir_r and game.is_blocked(row, col + 1)) or \
+                          (dir_u and game.is_blocked(row - 1, col)) or \
+                          (dir_d and game.is_blocked(row + 1, col))
+        danger_right = (dir_l and game.is_blocked(row - 1, col)) or \
+                       (dir_r and game.is_blocked(row + 1, col)) or \
+                       (dir_u and game.is_blocked(row, col + 1)) or \
+                       (dir_d and game.is_blocked(row, col - 1))
+        danger_left = (dir_l and game.is_blocked(row + 1, col)) or \
+                      (dir_r and game.is_blocked(row - 1, col)) or \
+                      (dir_u and game.is_blocked(row, col - 1)) or \
+                      (dir_d and game.is_blocked(row, col + 1))
+
+        # danger straight, right, left, move direction, food location
+        # the 0/1 features go into a bytearray seen as a uint8 array (the dtype the replay memory keeps states in),
+        # which skips np.array's type checks on every element
+        return np.frombuffer(bytearray((danger_straight, danger_right, danger_left, dir_l, dir_r, dir_u, dir_d,
+                                        food_l, food_r, food_u, food_d)), np.uint8)
+
+    # make a move and return the state it leaves the game in, along with reward, game_over and score
+    # the returned state is carried forward as the next move's state, so get_state runs once per move
+    def play_step(self, game, action):
+        reward, game_over, score = game.play_step(action)
+        return self.get_state(game), reward, game_over, score
 
     def remember(self, state, action, reward, state_new, game_over):
-        self.memory.append((state, action, reward, state_new, game_over)) # popleft if more than max mem
+        # memory keeps the index of the move, overwrites the oldest move if more than max mem
+        self.memory.append(state, action.index(1), reward, state_new, game_over)
 
     def train_long_memory(self):
-        if len(self.memory) > BATCH_SIZE:
-            mini_sample = random.sample(self.memory, BATCH_SIZE)
-        else:
-            mini_sample = self.memory
+        if self.config.prioritized_replay:
+            # moves with bigger TD errors are picked more often, the weights undo that bias in the loss
+            batch = self.memory.sample(self.config.BATCH_SIZE)
+            states, actions, rewards, states_new, games_over, weights, idx = batch
+            errors = self.trainer.train_step(states, actions, rewards, states_new, games_over, weights)
+            self.memory.update_priorities(idx, errors)
+            return
 
-        # put all categories together
-        states, actions, rewards, states_new, games_over = zip(*mini_sample)
+        # random batch (or everything while the memory is small), already as tensors
+        states, actions, rewards, states_new, games_over = self.memory.sample(self.config.BATCH_SIZE)
 
         self.trainer.train_step(states, actions, rewards, states_new, games_over)
 
+    # loss of the last training step, None before the first one
+    def last_loss(self):
+        return None if self.trainer.loss is None else self.trainer.loss.item()
+
     def train_short_memory(self, state, action, reward, state_new, game_over):
         self.trainer.train_step(state, action, reward, state_new, game_over)
 
+    # queue a checkpoint with everything needed to pick training up again (see checkpoint.py)
+    def checkpoint(self, checkpoints, score, best=False, **extra):
+        checkpoints.save(self.model, self.trainer.optimizer, self.number_of_games, self.epsilon, score, best=best,
+                         memory=self.memory.state(), seed=self.config.seed,
+                         rng={'agent': self.rng.bit_generator.state, 'memory': self.memory.rng.bit_generator.state},
+                         **extra)
+
+    # load model, optimizer, exploration schedule and replay memory position from a checkpoint
+    def restore(self, checkpoint):
+        self.model.load_state_dict(checkpoint['model'])
+        self.trainer.optimizer.load_state_dict(checkpoint['optimizer'])
+        self.number_of_games = checkpoint['number_of_games']
+        self.epsilon = checkpoint['epsilon']
+        # random streams go on where they were, so a resumed run makes the same choices as one that never stopped
+        if 'rng' in checkpoint:
+            self.rng.bit_generator.state = checkpoint['rng']['agent']
+            self.memory.rng.bit_generator.state = checkpoint['rng']['memory']
+        # an in-RAM memory starts empty again, only the memory-mapped one still has the transitions,
+        # and only if they are the checkpoint's run's (a fresh run in the same folder rewrites them)
+        if self.memory.path is not None and 'memory' in checkpoint:
+            owner = self.memory.owner()
+            run = {'seed': checkpoint.get('seed'), 'run_id': checkpoint.get('run_id')}
+            if not owner:
+                print(f'{self.memory.path} has no owner, the replay memory starts empty')
+                self.memory.clear()
+            elif owner != run:
+                raise ValueError(f'{self.memory.path} holds the replay memory of {owner}, the checkpoint is of {run}')
+            else:
+                self.memory.load_state(checkpoint['memory'])
+        elif self.memory.path is not None:
+            self.memory.clear()
+
+    # more games = smaller epsilon
+    def update_epsilon(self):
+        config = self.config
+        self.epsilon = config.min_exploration_rate + (config.max_exploration_rate - config.min_exploration_rate) * \
+                       np.exp(-config.exploration_decay_rate*self.number_of_games)
+
     def get_action(self, state):
         # do some random moves - tradeoff between exploration and exploitation
         # when model gets better, we will do less random moves
-
-        # more games = smaller epsilon
-        self.epsilon = min_exploration_rate + \
-                       (max_exploration_rate - min_exploration_rate) * np.exp(-exploration_decay_rate*self.number_of_games)
+        self.update_epsilon()
         final_move = [0, 0, 0]
 
         # get random move
         # when epsilon gets smaller, less chance of going into this if statement
         # ex: starting with 80/200 chance then going to 10/200 chance
         # can even become become negative, then no random moves
-        if random.uniform(0, 1) < self.epsilon:
-            move = random.randint(0, 2)
+        if self.rng.random() < self.epsilon:
+            # a scalar random() is much cheaper than rng.integers(3)
+            move = int(self.rng.random() * 3)
             final_move[move] = 1
         else:
-            # exploitation move
-            state0 = torch.tensor(state, dtype=torch.float)
-            prediction = self.model(state0) # this can be floating point array: [5.0, 2.7, 0.3]
-
-            move = torch.argmax(prediction).item() # take highest index in array
+            # exploitation move, highest predicted Q value: [5.0, 2.7, 0.3] -> 0
+            move = self.model.best_actions(state).item()
             final_move[move] = 1 # set highest index to 1, in this case would be [1, 0, 0]
 
         return final_move
 
-
-def train():
+    # get_action for a batch of states (many games or actors), returns an array of move indices
+    # the random/exploit choice is made for every state at once and the model runs once for all exploit moves
+    def get_actions(self, states):
+        self.update_epsilon()
+        states = np.asarray(states)
+
+        moves = self.rng.integers(0, 3, size=len(states))
+        exploit = self.rng.random(len(states)) >= self.epsilon
+        if exploit.any():
+            moves[exploit] = self.model.best_actions(states[exploit])
+        return moves
+
+# resume=True continues from the latest checkpoint: model, optimizer, exploration schedule,
+# scores so far and (with persistent_memory) the replay memory
+# config defaults to default_config(), folder keeps this run's model.pth, checkpoints, replay memory and metrics
+# profile=n captures a cProfile of the first n games (see profiling.py)
+# returns the run id in the results store and the final number of games, highscore and mean score
+def train(resume=False, config=None, folder=MODEL_FOLDER, profile=0):
     score_list = []
     mean_scores_list = []
     total_score = 0
     highscore = 0
-    agent = Agent()
-    game = SnakeGameAI()
+    # written on a background thread, see checkpoint.py
+    checkpoints = CheckpointManager(os.path.join(folder, 'checkpoints'), keep_last=KEEP_LAST_CHECKPOINTS,
+                                    keep_best=KEEP_BEST_CHECKPOINTS, best_model_path=os.path.join(folder, 'model.pth'))
+
+    latest = checkpoints.latest() if resume else None
+    if not resume:
+        # a fresh run never mixes its checkpoints with an earlier run's
+        archive = checkpoints.archive()
+        if archive is not None:
+            print(f'Checkpoints of the previous run moved to {archive}')
+    checkpoint = CheckpointManager.load(latest) if latest is not None else {}
+    config = config if config is not None else default_config()
+    if config.seed is None and 'seed' in checkpoint:
+        # a resumed run goes on with its own seed
+        config = replace(config, seed=checkpoint['seed'])
+    # without a checkpoint there is nothing to resume, the replay memory starts with fresh columns
+    agent = Agent(resume=latest is not None, config=config, folder=folder)
+    config = agent.config
+    if latest is not None:
+        agent.restore(checkpoint)
+        score_list = checkpoint.get('score_list', [])
+        mean_scores_list = checkpoint.get('mean_scores_list', [])
+        total_score = sum(score_list)
+        highscore = max(score_list, default=0)
+        print(f'Resuming from {latest} at game #{agent.number_of_games} with {len(agent.memory)} moves in memory')
+    mean_score = total_score / agent.number_of_games if agent.number_of_games else 0
+    # game n of the run is always played on the same seed, also after a resume
+    game = SnakeGameAI(headless=headless, seed=agent.seeds.game_seed(agent.number_of_games))
+    state_old = agent.get_state(game)
+
+    # every run is recorded in results.db, a resumed run keeps its run id
+    results = ResultsStore()
+    run_id = checkpoint.get('run_id') if latest is not None else None
+    if run_id is None:
+        run_id = results.start_run(asdict(config))
+    agent.memory.set_owner(seed=config.seed, run_id=run_id)
+    # games not yet written to the results store
+    episodes = []
+
+    # a fresh run starts a fresh metrics file, a resumed one keeps adding to it after the games up to its checkpoint
+    metrics_file = os.path.join(folder, METRICS_FILE)
+    metrics = MetricsWriter(metrics_file, append=latest is not None, games=agent.number_of_games)
+    plotter = LivePlot(metrics_file).start() if live_plot and not metrics_file.endswith('.csv') else None
+    start = time.perf_counter()
+
+    profiler = TrainingProfiler(PROFILE_EVERY, os.path.join(folder, 'profiles'))
+    profiler.install_signal(PROFILE_GAMES)
+    profiler.request(profile)
+    profiler.start_game(agent.number_of_games)
+
+    # a fresh run starts fresh episode files like its metrics file, so episode ids are its game numbers,
+    # a resumed run drops the games recorded after its checkpoint, they are played again
+    recorded = checkpoint.get('episodes') if latest is not None else 0
+    recorder = EpisodeWriter(os.path.join(folder, EPISODES_FILE), recorded) if record_games else None
+    # moves of the game being played
+    moves = bytearray()
+
+    spectator = None
+    if spectate:
+        spectator = Spectator(SPECTATE_EVERY, SPECTATE_HIGHSCORES, SPECTATOR_FPS, game.WIDTH, game.HEIGHT).start()
+        spectator.highscore = highscore
+        spectator.start_episode(game)
 
     # training loop
     while True:
-        if agent.number_of_games == 400:
-            annotate([MAX_MEMORY, BATCH_SIZE, LEARNING_RATE, max_exploration_rate, min_exploration_rate, exploration_decay_rate, 
-                      agent.gamma, agent.hidden_layers, far_dangers, agent.number_of_games, highscore, mean_score], "Results.xlsx")
-            break
-        # get old/current state
-        state_old = agent.get_state(game)
+        if agent.number_of_games >= config.max_games:
+            results.add_episodes(run_id, episodes)
+            results.finish_run(run_id, number_of_games=agent.number_of_games, highscore=highscore, mean_score=mean_score)
+            results.close()
+            # saved with the last game's score like every other checkpoint, its score ranks it among the best ones
+            agent.checkpoint(checkpoints, score_list[-1] if score_list else 0, run_id=run_id, score_list=score_list,
+                             mean_scores_list=mean_scores_list, episodes=recorder and recorder.count)
+            checkpoints.close()
+            agent.memory.flush()
+            metrics.close()
+            if plotter is not None:
+                plotter.stop()
+            if spectator is not None:
+                spectator.stop()
+            if recorder is not None:
+                recorder.close()
+            return {'run_id': run_id, 'number_of_games': agent.number_of_games, 'highscore': highscore,
+                    'mean_score': mean_score}
+        timed = profiler.active
+        if timed:
+            lap = time.perf_counter()
 
         # get move based on current state
         action = agent.get_action(state_old)
+        if recorder is not None:
+            moves.append(action.index(1))
+        if timed:
+            lap = profiler.lap('get_action', lap)
 
-        # make move and get new state
+        # make move and get new state (Agent.play_step, in two parts for the timings)
         reward, done, score = game.play_step(action)
+        if spectator is not None and not done:
+            spectator.record(game)
+        if timed:
+            lap = profiler.lap('play_step', lap)
         state_new = agent.get_state(game)
+        if timed:
+            lap = profiler.lap('get_state', lap)
 
         # train short memory
         agent.train_short_memory(state_old, action, reward, state_new, done)
+        if timed:
+            lap = profiler.lap('train_short_memory', lap)
 
         # remember
         agent.remember(state_old, action, reward, state_new, done)
+        if timed:
+            lap = profiler.lap('remember', lap)
 
         if done:
             # train long memory/replay memory
             #       trains on all the previous moves played to improve
-            print(f"{agent.epsilon=}")
-            game.reset()
+            steps = game.frame_iteration
+            if spectator is not None:
+                spectator.end_episode(agent.number_of_games + 1, score)
+            if recorder is not None:
+                recorder.write(game.seed, game.WIDTH, game.HEIGHT, moves, score)
+                moves = bytearray()
+            game.reset(agent.seeds.game_seed(agent.number_of_games + 1))
+            if spectator is not None:
+                spectator.start_episode(game)
+            # only a fresh game needs a fresh state
+            state_new = agent.get_state(game)
             agent.number_of_games += 1
+            if timed:
+                lap = profiler.lap('reset', lap)
             agent.train_long_memory()
-
-            if score > highscore:
-                highscore = score
-                agent.model.save()
+            if timed:
+                lap = profiler.lap('train_long_memory', lap)
 
             score_list.append(score)
             total_score += score
             mean_score = total_score / agent.number_of_games
             mean_scores_list.append(mean_score)
-            plot(score_list, mean_scores_list)
-            print(f'Game #{agent.number_of_games} Score: {score} Mean Score: {mean_score} Highscore: {highscore}')
+
+            best = score > highscore
+            checkpointed = best or agent.number_of_games % CHECKPOINT_EVERY == 0
+            highscore = max(highscore, score)
+            record = dict(game=agent.number_of_games, score=score, mean_score=mean_score, highscore=highscore,
+                          epsilon=agent.epsilon, steps=steps, loss=agent.last_loss(),
+                          time=round(time.perf_counter() - start, 3))
+            episodes.append(record)
+            if checkpointed:
+                # a resume starts after the latest checkpoint, so every game up to it has to be in the results store
+                # before the checkpoint is written (a game written twice just replaces its row)
+                results.add_episodes(run_id, episodes)
+                episodes = []
+                # a best checkpoint also writes model/model.pth
+                agent.checkpoint(checkpoints, score, best=best, run_id=run_id, score_list=score_list,
+                                 mean_scores_list=mean_scores_list, episodes=recorder and recorder.count)
+            if timed:
+                lap = profiler.lap('checkpoint', lap)
+            if agent.number_of_games % PRINT_EVERY == 0:
+                print(f'Game #{agent.number_of_games} Score: {score} Mean Score: {mean_score} Highscore: {highscore}')
+            if timed:
+                lap = profiler.lap('results', lap)
+            timings = profiler.end_game(agent.number_of_games)
+            if timings:
+                timings.update(replay_bytes=agent.memory.nbytes(), rss_bytes=rss_bytes())
+            metrics.log(**record, **timings)
+            if checkpointed:
+                metrics.flush()
+            profiler.start_game(agent.number_of_games)
+
+        # new state becomes the current state of the next move
+        state_old = state_new
 
 if __name__ == '__main__':
-    train()
\ No newline at end of file
+    # python agent.py --resume picks up where the last run stopped
+    # python agent.py --profile 20 writes a cProfile of the first 20 games to model/profiles
+    train(resume='--resume' in sys.argv,
+          profile=int(sys.argv[sys.argv.index('--profile') + 1]) if '--profile' in sys.argv else 0)
\ No newline at end of file
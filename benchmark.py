@@ -0,0 +1,358 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from dataclasses import replace
+import numpy as np
+import pygame
+import torch
+import agent as agent_module
+from agent import Agent
+from model import Linear_QNet, QTrainer
+from replay import ReplayMemory, PrioritizedReplayMemory
+from SnakeAI_batch import BatchSnakeGameAI
+from SnakeAI import SnakeGameAI, DIRECTION_DELTAS, CLOCKWISE_INDEX
+
+MOVES = [[1, 0, 0], [0, 1, 0], [0, 0, 1]]
+
+
+# agent that counts and times its get_state calls
+class TimedAgent(Agent):
+
+    def __init__(self):
+        super().__init__(persistent=False)
+        self.state_calls = 0
+        self.state_time = 0
+
+    def get_state(self, game):
+        start = time.perf_counter()
+        state = super().get_state(game)
+        self.state_time += time.perf_counter() - start
+        self.state_calls += 1
+        return state
+
+
+# plays `steps` random moves the way train() collects transitions
+# reuse=False is the old loop: get_state before the move and again after it
+# reuse=True carries the state returned by Agent.play_step forward to the next move
+def observation_reuse(steps=20000, reuse=True):
+    random.seed(0)
+    agent = TimedAgent()
+    game = SnakeGameAI(headless=True)
+    if reuse:
+        state_old = agent.get_state(game)
+
+    for _ in range(steps):
+        if not reuse:
+            state_old = agent.get_state(game)
+        action = random.choice(MOVES)
+        if reuse:
+            state_new, reward, done, score = agent.play_step(game, action)
+        else:
+            reward, done, score = game.play_step(action)
+            state_new = agent.get_state(game)
+        if done:
+            game.reset()
+            if reuse:
+                state_new = agent.get_state(game)
+        state_old = state_new
+
+    return agent.state_calls / steps, agent.state_time / steps
+
+
+# the old per-sample target loop (with each row's own action), QTrainer.compute_targets must match it
+def reference_targets(trainer, pred, action, reward, state_new, game_over):
+    target = pred.detach().clone()
+    with torch.no_grad():
+        for i in range(len(game_over)):
+            Q_new = reward[i]
+            if not game_over[i]:
+                Q_new = reward[i] + trainer.gamma * torch.max(trainer.model(state_new[i]))
+            target[i][action[i]] = Q_new
+    return target
+
+
+# random batch shaped like a replay memory sample
+def random_batch(batch_size, state_size=14):
+    return (torch.randint(0, 2, (batch_size, state_size)).float(),
+            torch.randint(0, 3, (batch_size,)),
+            torch.randint(-1, 2, (batch_size,)).float() * 10,
+            torch.randint(0, 2, (batch_size, state_size)).float(),
+            torch.rand(batch_size) < 0.1)
+
+
+# checks the batched targets against the per-sample loop on random batches and times both
+# returns the largest difference seen and the seconds per batch of each
+def train_targets(batch_size=1000, batches=5):
+    torch.manual_seed(0)
+    trainer = QTrainer(Linear_QNet(14, 1000, 3), learning_rate=0.001, gamma=0.8)
+    worst, batched_time, loop_time = 0, 0, 0
+    for _ in range(batches):
+        state, action, reward, state_new, game_over = random_batch(batch_size)
+        pred = trainer.model(state)
+
+        start = time.perf_counter()
+        target = trainer.compute_targets(pred, action, reward, state_new, game_over)
+        batched_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        expected = reference_targets(trainer, pred, action, reward, state_new, game_over)
+        loop_time += time.perf_counter() - start
+
+        worst = max(worst, (target - expected).abs().max().item())
+    return worst, batched_time / batches, loop_time / batches
+
+
+# fills a memory to `capacity` transitions with random ones
+def fill_memory(memory, chunk=100000):
+    rng = np.random.default_rng(0)
+    state_size = memory.states.shape[1]
+    for _ in range(0, memory.capacity, chunk):
+        memory.extend(rng.integers(0, 2, (chunk, state_size)), rng.integers(0, 3, chunk), rng.random(chunk),
+                      rng.integers(0, 2, (chunk, state_size)), rng.random(chunk) < 0.1)
+
+
+# times sampling a batch from a filled memory
+# for the prioritized memory the time includes writing the new priorities back
+# returns seconds per batch
+def sample_rate(memory, batch_size=1000, batches=50):
+    rng = np.random.default_rng(0)
+    start = time.perf_counter()
+    for _ in range(batches):
+        batch = memory.sample(batch_size)
+        if isinstance(memory, PrioritizedReplayMemory):
+            memory.update_priorities(batch[-1], rng.standard_normal(batch_size))
+    return (time.perf_counter() - start) / batches
+
+
+# fills a memory to `capacity` transitions and times sampling a batch from it, seconds per batch
+def replay_sampling(memory, batch_size=1000, batches=50, chunk=100000):
+    fill_memory(memory, chunk)
+    return sample_rate(memory, batch_size, batches)
+
+
+# seconds per game step spent choosing moves for `num_games` games, one get_action call per game
+# against a single get_actions call for the whole batch (greedy, so every move goes through the model)
+def action_selection(num_games=256, rounds=20):
+    agent = Agent(persistent=False)
+    agent.number_of_games = 10000
+    states = BatchSnakeGameAI(num_games, seed=0).get_states()
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for state in states:
+            agent.get_action(state)
+    single = (time.perf_counter() - start) / (rounds * num_games)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        agent.get_actions(states)
+    batched = (time.perf_counter() - start) / (rounds * num_games)
+    return single, batched
+
+
+# snake lengths the per-call timings are taken at, from a fresh game to a nearly full board
+SNAKE_LENGTHS = [1, 50, 200, 390]
+BATCH_SIZES = [64, 256, 1000, 4096]
+
+
+# lays a snake of `length` tiles on the board, row by row in a zigzag from the top left corner,
+# with the head at the end of the zigzag and the food on a free tile
+def lay_snake(game, length):
+    game.reset()
+    cols = game.COLS
+    path = [row * cols + (col if row % 2 == 0 else cols - 1 - col) for row in range(game.ROWS) for col in range(cols)]
+    game.body.clear()
+    for tile in path[:length]:
+        game.body.push_head(tile)
+    game.head_row, game.head_col = divmod(path[length - 1], cols)
+    if length > 1:
+        d_row, d_col = game.head_row - path[length - 2] // cols, game.head_col - path[length - 2] % cols
+        game.direction = next(d for d, delta in DIRECTION_DELTAS.items() if delta == (d_row, d_col))
+        game.heading = CLOCKWISE_INDEX[game.direction]
+    game.place_food()
+
+
+# seconds per call of fn, called `calls` times
+def per_call(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls
+
+
+# play_step with random moves, games restarted when they end, returns steps per second
+# rendered games draw every step, with no frame rate cap so only the drawing is measured
+def play_steps(steps=50000, headless=True):
+    random.seed(0)
+    game = SnakeGameAI(headless=headless, fps=0)
+    start = time.perf_counter()
+    for _ in range(steps):
+        reward, done, score = game.play_step(random.choice(MOVES))
+        if done:
+            game.reset()
+    seconds = time.perf_counter() - start
+    if not headless:
+        game.detach_renderer()
+    return steps / seconds
+
+
+# seconds per call of the feature extraction and board checks with a snake of `length` tiles
+# get_state is timed with the configured state and with the 11 features (no far dangers)
+def hot_paths(length, calls=20000):
+    agent = Agent(persistent=False, config=replace(agent_module.default_config(), MAX_MEMORY=1))
+    agent_11 = Agent(persistent=False, config=replace(agent.config, far_dangers=False))
+    game = SnakeGameAI(headless=True)
+    lay_snake(game, length)
+    timings = {
+        'get_state': per_call(lambda: agent.get_state(game), calls),
+        'get_state_11': per_call(lambda: agent_11.get_state(game), calls),
+        'calculate_far_dangers': per_call(game.calculate_far_dangers, calls),
+        'is_collision': per_call(game.is_collision, calls),
+    }
+    # place_food only picks a tile, the snake stays as it is
+    timings['place_food'] = per_call(game.place_food, calls)
+    return timings
+
+
+# samples per second QTrainer.train_step trains on with batches of batch_size
+def train_step_rate(batch_size, batches=20):
+    torch.manual_seed(0)
+    trainer = QTrainer(Linear_QNet(14, 1000, 3), learning_rate=0.001, gamma=0.8)
+    batch = random_batch(batch_size)
+    trainer.train_step(*batch)
+    start = time.perf_counter()
+    for _ in range(batches):
+        trainer.train_step(*batch)
+    return batch_size * batches / (time.perf_counter() - start)
+
+
+# games per second of the whole train() loop, in a scratch folder so no model, checkpoint or result is touched
+def train_rate(games=50):
+    # a fixed seed, so every run of the benchmark plays the same games
+    config = replace(agent_module.default_config(), max_games=games, MAX_MEMORY=100000, seed=0)
+    cwd = os.getcwd()
+    print_every = agent_module.PRINT_EVERY
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)
+        agent_module.PRINT_EVERY = sys.maxsize
+        try:
+            start = time.perf_counter()
+            agent_module.train(config=config)
+            return games / (time.perf_counter() - start)
+        finally:
+            os.chdir(cwd)
+            agent_module.PRINT_EVERY = print_every
+
+
+def result(value, unit, higher_is_better):
+    return {'value': value, 'unit': unit, 'higher_is_better': higher_is_better}
+
+
+# runs every benchmark, returns {name: {'value', 'unit', 'higher_is_better'}}
+# quick=True uses fewer steps, a smaller replay memory and fewer training games
+def run_suite(quick=False):
+    scale = 10 if quick else 1
+    results = {}
+
+    results['play_step.headless'] = result(play_steps(50000 // scale), 'steps/s', True)
+
+    for length in SNAKE_LENGTHS:
+        for name, seconds in hot_paths(length, 20000 // scale).items():
+            results[f'{name}.length_{length}'] = result(seconds * 1e6, 'us/call', False)
+
+    for reuse in (False, True):
+        calls, seconds = observation_reuse(20000 // scale, reuse=reuse)
+        results[f'observation.{"reuse" if reuse else "recompute"}'] = result(seconds * 1e6, 'us/transition', False)
+
+    worst, batched, loop = train_targets()
+    results['train_targets.max_difference'] = result(worst, 'abs', False)
+    results['train_targets.batched'] = result(batched * 1e3, 'ms/batch', False)
+
+    capacity = 400000 if quick else 4000000
+    for memory_type in (ReplayMemory, PrioritizedReplayMemory):
+        memory = memory_type(capacity, 14)
+        fill_memory(memory)
+        for batch_size in BATCH_SIZES:
+            seconds = sample_rate(memory, batch_size, 50 // scale)
+            results[f'{memory_type.__name__}.sample.batch_{batch_size}'] = \
+                result(batch_size / seconds, 'samples/s', True)
+
+    for batch_size in BATCH_SIZES:
+        results[f'train_step.batch_{batch_size}'] = result(train_step_rate(batch_size, 20 // min(scale, 4)),
+                                                           'samples/s', True)
+
+    single, batched = action_selection(rounds=20 // scale)
+    results['get_action.single'] = result(single * 1e6, 'us/move', False)
+    results['get_actions.batched'] = result(batched * 1e6, 'us/move', False)
+
+    results['train.games'] = result(train_rate(20 if quick else 50), 'games/s', True)
+
+    # last, the window is opened after everything else has set up torch
+    try:
+        results['play_step.rendered'] = result(play_steps(2000 // scale, headless=False), 'steps/s', True)
+    except pygame.error as error:
+        print(f'play_step.rendered skipped: {error}')
+    return results
+
+
+# benchmarks that got worse than the baseline by more than threshold (0.1 = 10%)
+# returns (name, baseline value, new value, relative change) for each, the change is negative when worse
+def compare(results, baseline, threshold=0.1):
+    regressions = []
+    for name, new in results.items():
+        old = baseline.get(name)
+        if old is None or not old['value'] or name == 'train_targets.max_difference':
+            continue
+        change = (new['value'] - old['value']) / old['value']
+        if not new['higher_is_better']:
+            change = -change
+        if change < -threshold:
+            regressions.append((name, old['value'], new['value'], change))
+    return regressions
+
+
+if __name__ == '__main__':
+    # python benchmark.py --output baseline.json            runs the suite and stores it
+    # python benchmark.py --baseline baseline.json          runs it again and flags regressions (exit code 1)
+    # python benchmark.py --check                           only checks the batched train targets (exit code 1 if off)
+    parser = argparse.ArgumentParser(description='SnakeAI simulation and training benchmarks')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='JSON file of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative slowdown that counts as a regression')
+    parser.add_argument('--quick', action='store_true', help='smaller, faster runs')
+    parser.add_argument('--check', action='store_true',
+                        help='only check the batched train targets against the per-sample loop')
+    args = parser.parse_args()
+
+    if args.check:
+        worst = train_targets(batches=20)[0]
+    else:
+        results = run_suite(args.quick)
+        for name, value in results.items():
+            print(f'{name:48} {value["value"]:14.4g} {value["unit"]}')
+        worst = results['train_targets.max_difference']['value']
+
+    # batched and single-row matrix products only differ in float32 rounding
+    # a mismatch fails every run, with or without a baseline
+    print(f'train targets: {"match" if worst < 1e-4 else "MISMATCH"} (max difference to per-sample loop {worst:.3g})')
+    if args.check:
+        sys.exit(1 if worst >= 1e-4 else 0)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.threshold)
+        for name, old, new, change in regressions:
+            print(f'REGRESSION {name}: {old:.4g} -> {new:.4g} ({change:+.0%})')
+        if not regressions:
+            print(f'no regressions against {args.baseline}')
+    sys.exit(1 if regressions or worst >= 1e-4 else 0)
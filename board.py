@@ -0,0 +1,187 @@
+from collections.abc import Sequence
+
+
+# set of free tiles that supports O(1) add, remove and uniform random sampling
+# free tiles are packed at the front of self.cells (swap-remove), self.position[tile] is where a tile sits in it
+class FreeCells:
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.cells = list(range(capacity))
+        self.position = list(range(capacity))
+        self.count = capacity
+
+    def fill(self):
+        self.cells[:] = range(self.capacity)
+        self.position[:] = range(self.capacity)
+        self.count = self.capacity
+
+    def remove(self, tile):
+        # move the last free tile into the hole left by this one
+        i = self.position[tile]
+        self.count -= 1
+        last = self.cells[self.count]
+        self.cells[i] = last
+        self.position[last] = i
+        self.cells[self.count] = tile
+        self.position[tile] = self.count
+
+    def add(self, tile):
+        i = self.position[tile]
+        first_used = self.cells[self.count]
+        self.cells[i] = first_used
+        self.position[first_used] = i
+        self.cells[self.count] = tile
+        self.position[tile] = self.count
+        self.count += 1
+
+    # random free tile, rng is anything with randrange (random module or random.Random)
+    def sample(self, rng):
+        return self.cells[rng.randrange(self.count)]
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, tile):
+        return self.position[tile] < self.count
+
+
+# nearest body part/wall in each direction from any tile, kept up to date one tile at a time
+# every row and every column is a bitmask of the body tiles on it (bit = column or row), so finding the
+# closest obstacle along a ray is a couple of integer bit operations instead of a walk over the tiles
+# directions are clockwise indices: 0 right, 1 down, 2 left, 3 up
+class DangerMap:
+
+    def __init__(self, rows, cols):
+        self.rows = rows
+        self.cols = cols
+        self.row_masks = [0] * rows
+        self.col_masks = [0] * cols
+        # rays by clockwise heading index
+        self.rays = (self.rays_right, self.rays_down, self.rays_left, self.rays_up)
+
+    def clear(self):
+        self.row_masks[:] = [0] * self.rows
+        self.col_masks[:] = [0] * self.cols
+
+    def add(self, row, col):
+        self.row_masks[row] |= 1 << col
+        self.col_masks[col] |= 1 << row
+
+    def remove(self, row, col):
+        self.row_masks[row] &= ~(1 << col)
+        self.col_masks[col] &= ~(1 << row)
+
+    # the rays [straight, right, left] of a head going right, down, left or up, the one behind it is skipped
+    # a right turn is the next clockwise direction: right -> down -> left -> up -> right
+    # one function per heading so there is no branching on it, self.rays[heading](row, col) picks the right one
+    def rays_right(self, row, col):
+        col_mask = self.col_masks[col]
+        ahead = col_mask >> (row + 1)
+        down = (ahead & -ahead).bit_length() if ahead else self.rows - row
+        behind = col_mask & ((1 << row) - 1)
+        up = row - behind.bit_length() + 1 if behind else row + 1
+        ahead = self.row_masks[row] >> (col + 1)
+        right = (ahead & -ahead).bit_length() if ahead else self.cols - col
+        return right, down, up
+
+    def rays_down(self, row, col):
+        row_mask = self.row_masks[row]
+        ahead = row_mask >> (col + 1)
+        right = (ahead & -ahead).bit_length() if ahead else self.cols - col
+        behind = row_mask & ((1 << col) - 1)
+        left = col - behind.bit_length() + 1 if behind else col + 1
+        ahead = self.col_masks[col] >> (row + 1)
+        down = (ahead & -ahead).bit_length() if ahead else self.rows - row
+        return down, left, right
+
+    def rays_left(self, row, col):
+        col_mask = self.col_masks[col]
+        ahead = col_mask >> (row + 1)
+        down = (ahead & -ahead).bit_length() if ahead else self.rows - row
+        behind = col_mask & ((1 << row) - 1)
+        up = row - behind.bit_length() + 1 if behind else row + 1
+        behind = self.row_masks[row] & ((1 << col) - 1)
+        left = col - behind.bit_length() + 1 if behind else col + 1
+        return left, up, down
+
+    def rays_up(self, row, col):
+        row_mask = self.row_masks[row]
+        ahead = row_mask >> (col + 1)
+        right = (ahead & -ahead).bit_length() if ahead else self.cols - col
+        behind = row_mask & ((1 << col) - 1)
+        left = col - behind.bit_length() + 1 if behind else col + 1
+        behind = self.col_masks[col] & ((1 << row) - 1)
+        up = row - behind.bit_length() + 1 if behind else row + 1
+        return up, right, left
+
+
+# snake body stored as a fixed-size ring buffer of tile indices, head first
+# the capacity is the board area so the buffer never has to grow
+# push_head and pop_tail are O(1), and the occupancy grid (one byte per tile), free tiles and
+# danger map are kept in sync
+class SnakeBody:
+
+    def __init__(self, rows, cols):
+        self.cols = cols
+        self.capacity = rows * cols
+        self.tiles = [0] * self.capacity
+        self.grid = bytearray(self.capacity)
+        self.free = FreeCells(self.capacity)
+        self.dangers = DangerMap(rows, cols)
+        self.start = 0
+        self.length = 0
+
+    def clear(self):
+        self.grid[:] = bytes(self.capacity)
+        self.free.fill()
+        self.dangers.clear()
+        self.start = 0
+        self.length = 0
+
+    def push_head(self, tile):
+        self.start = (self.start - 1) % self.capacity
+        self.tiles[self.start] = tile
+        self.grid[tile] = 1
+        self.free.remove(tile)
+        self.dangers.add(*divmod(tile, self.cols))
+        self.length += 1
+
+    def pop_tail(self):
+        self.length -= 1
+        tile = self.tiles[(self.start + self.length) % self.capacity]
+        self.grid[tile] = 0
+        self.free.add(tile)
+        self.dangers.remove(*divmod(tile, self.cols))
+        return tile
+
+    def __len__(self):
+        return self.length
+
+
+# read-only view of a SnakeBody for the ui, the agent and the danger checks
+# iterates head to tail, supports len(), indexing (snake[0] is the head, snake[-1] the tail) and `tile in snake`
+class BodyView(Sequence):
+
+    def __init__(self, body):
+        self._body = body
+
+    def __len__(self):
+        return self._body.length
+
+    def __getitem__(self, i):
+        body = self._body
+        if i < 0:
+            i += body.length
+        if not 0 <= i < body.length:
+            raise IndexError('snake index out of range')
+        return body.tiles[(body.start + i) % body.capacity]
+
+    def __iter__(self):
+        body = self._body
+        tiles, capacity = body.tiles, body.capacity
+        for i in range(body.start, body.start + body.length):
+            yield tiles[i % capacity]
+
+    def __contains__(self, tile):
+        return bool(self._body.grid[tile])
@@ -0,0 +1,128 @@
+import copy
+import os
+import queue
+import re
+import tempfile
+import threading
+import time
+import torch
+
+CHECKPOINT_NAME = re.compile(r'checkpoint_(\d+)_(\d+)\.pth$')
+
+
+# writes torch files atomically: into a temporary file next to the target, then renamed over it,
+# so a crash mid-write never leaves a half written file behind
+def atomic_save(obj, file_name):
+    temp_name = file_name + '.tmp'
+    torch.save(obj, temp_name)
+    os.replace(temp_name, file_name)
+
+
+# checkpoints written on a background thread so the training loop never waits on the disk
+# save() copies the model/optimizer state in memory and returns, the writer thread stores it as
+# checkpoint_<games>_<score>.pth and keeps only the last `keep_last` and the best `keep_best` checkpoints
+# each checkpoint has the model and optimizer state, the game count, epsilon and the score it was saved with
+# checkpoints saved with best=True (new highscore) also write the weights to best_model_path,
+# by default the same model/model.pth that Linear_QNet.save writes
+class CheckpointManager:
+
+    def __init__(self, folder='./model/checkpoints', keep_last=3, keep_best=3, best_model_path='./model/model.pth'):
+        self.folder = folder
+        self.keep_last = keep_last
+        self.keep_best = keep_best
+        self.best_model_path = best_model_path
+        os.makedirs(folder, exist_ok=True)
+
+        # (games, score, path) of every checkpoint on disk, also ones from earlier runs
+        self.checkpoints = []
+        for name in os.listdir(folder):
+            match = CHECKPOINT_NAME.match(name)
+            if match:
+                self.checkpoints.append((int(match.group(1)), int(match.group(2)), os.path.join(folder, name)))
+
+        self.pending = queue.Queue()
+        self.error = None
+        self.writer = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer.start()
+
+    # snapshot the training state and queue it for writing
+    # extra is any other picklable state to keep in the checkpoint
+    def save(self, model, optimizer, number_of_games, epsilon, score, best=False, **extra):
+        if self.error is not None:
+            raise self.error
+        snapshot = {
+            'model': {name: tensor.detach().clone() for name, tensor in model.state_dict().items()},
+            'optimizer': copy.deepcopy(optimizer.state_dict()),
+            'number_of_games': number_of_games,
+            'epsilon': float(epsilon),
+            'score': score,
+            'best': best,
+        }
+        snapshot.update(copy.deepcopy(extra))
+        self.pending.put(snapshot)
+
+    # block until everything queued so far is on disk
+    def wait(self):
+        self.pending.join()
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        self.wait()
+        self.pending.put(None)
+        self.writer.join()
+
+    # moves every checkpoint on disk into a new archive_<time>_* subfolder, where it is no longer seen as a
+    # checkpoint, e.g. so a fresh run in the folder doesn't adopt (or delete) the previous run's checkpoints
+    # returns the subfolder, None when there was nothing to move
+    def archive(self):
+        self.wait()
+        if not self.checkpoints:
+            return None
+        archive = tempfile.mkdtemp(prefix=time.strftime('archive_%Y%m%d-%H%M%S_'), dir=self.folder)
+        for _, _, path in self.checkpoints:
+            os.replace(path, os.path.join(archive, os.path.basename(path)))
+        self.checkpoints = []
+        return archive
+
+    # path of the checkpoint with the most games, or None
+    def latest(self):
+        self.wait()
+        if not self.checkpoints:
+            return None
+        return max(self.checkpoints)[2]
+
+    @staticmethod
+    def load(path):
+        return torch.load(path, weights_only=False)
+
+    def _write_loop(self):
+        while True:
+            snapshot = self.pending.get()
+            if snapshot is None:
+                self.pending.task_done()
+                return
+            try:
+                self._write(snapshot)
+            except Exception as error:
+                self.error = error
+            finally:
+                self.pending.task_done()
+
+    def _write(self, snapshot):
+        games, score = snapshot['number_of_games'], snapshot['score']
+        path = os.path.join(self.folder, f'checkpoint_{games:07d}_{score}.pth')
+        atomic_save(snapshot, path)
+        self.checkpoints = [c for c in self.checkpoints if c[2] != path] + [(games, score, path)]
+
+        if self.best_model_path and snapshot['best']:
+            atomic_save(snapshot['model'], self.best_model_path)
+
+        # keep the newest and the highest scoring checkpoints, remove the rest
+        newest = sorted(self.checkpoints, reverse=True)[:self.keep_last]
+        best = sorted(self.checkpoints, key=lambda c: (c[1], c[0]), reverse=True)[:self.keep_best]
+        keep = set(newest) | set(best)
+        for checkpoint in self.checkpoints:
+            if checkpoint not in keep and os.path.exists(checkpoint[2]):
+                os.remove(checkpoint[2])
+        self.checkpoints = [c for c in self.checkpoints if c in keep]
@@ -0,0 +1,124 @@
+import argparse
+import functools
+import json
+import os
+import time
+import multiprocessing as mp
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+import numpy as np
+import torch
+
+# games one pool task plays, small enough to keep every worker busy until the end
+CHUNK_GAMES = 50
+
+
+# a Linear_QNet state dict from model.pth, or the model of a checkpoint (see checkpoint.py)
+def load_state_dict(path):
+    saved = torch.load(path, map_location='cpu', weights_only=False)
+    return saved['model'] if 'model' in saved else saved
+
+
+# an agent around the saved model, only used for get_state and the model, so its replay memory is tiny
+# the input and hidden sizes come from the weights, 14 inputs means the far dangers are part of the state
+# loaded once per pool process
+@functools.lru_cache(maxsize=None)
+def load_agent(path, far_danger_distances):
+    from agent import Agent, default_config
+
+    state_dict = load_state_dict(path)
+    hidden_layers, input_layer = state_dict['linear1.weight'].shape
+    config = replace(default_config(), MAX_MEMORY=1, hidden_layers=hidden_layers, far_dangers=input_layer == 14,
+                     far_danger_distances=far_danger_distances, seed=0)
+    agent = Agent(persistent=False, config=config)
+    agent.model.load_state_dict(state_dict)
+    agent.model.eval()
+    return agent
+
+
+# pool task: plays one greedy game per seed, returns (score, steps, death cause) for each
+# the model always takes its best move, there is no exploration
+def play_games(path, far_danger_distances, seeds):
+    from SnakeAI import SnakeGameAI
+
+    agent = load_agent(path, far_danger_distances)
+    game = SnakeGameAI(headless=True)
+    final_move = [0, 0, 0]
+    games = []
+    for seed in seeds:
+        game.reset(seed)
+        done = False
+        while not done:
+            move = agent.model.best_actions(agent.get_state(game)).item()
+            final_move[move] = 1
+            reward, done, score = game.play_step(final_move)
+            final_move[move] = 0
+        games.append((score, game.frame_iteration, 'won' if game.won else game.death_cause))
+    return games
+
+
+def summary(games, seconds):
+    scores = np.array([score for score, _, _ in games])
+    steps = np.array([steps for _, steps, _ in games])
+    return {
+        'games': len(games),
+        'mean_score': float(scores.mean()),
+        'median_score': float(np.median(scores)),
+        'p5_score': float(np.percentile(scores, 5)),
+        'p95_score': float(np.percentile(scores, 95)),
+        'max_score': int(scores.max()),
+        'mean_steps': float(steps.mean()),
+        'death_causes': dict(Counter(cause for _, _, cause in games)),
+        'games_per_second': len(games) / seconds,
+    }
+
+
+# plays `games` headless greedy games of the model at path on `workers` processes and returns their summary
+# game n is played on the game seed n of run seed `seed` (see seeding.py), so two models evaluated with the same
+# seed play on exactly the same food placements
+# far_danger_distances defaults to the training setting in agent.py, it can't be told from the weights
+def evaluate(path, games=5000, seed=0, workers=None, far_danger_distances=None):
+    from agent import far_danger_distances as trained_with_distances
+    from seeding import RunSeeds
+    from sweep import pin_threads
+
+    if far_danger_distances is None:
+        far_danger_distances = trained_with_distances
+    if workers is None:
+        workers = os.cpu_count() or 1
+    seeds = RunSeeds(seed)
+    game_seeds = [seeds.game_seed(n) for n in range(games)]
+    chunks = [game_seeds[i:i + CHUNK_GAMES] for i in range(0, games, CHUNK_GAMES)]
+
+    start = time.perf_counter()
+    context = mp.get_context('spawn')
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=pin_threads, initargs=(1,)) as pool:
+        results = pool.map(play_games, [path] * len(chunks), [far_danger_distances] * len(chunks), chunks)
+        played = [game for chunk in results for game in chunk]
+    return summary(played, time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    # python evaluate.py model/model.pth --games 10000
+    # python evaluate.py model/checkpoints/checkpoint_0000400_31.pth --output eval.json
+    parser = argparse.ArgumentParser(description='greedy evaluation of a saved SnakeAI model')
+    parser.add_argument('path', nargs='?', default=os.path.join('model', 'model.pth'),
+                        help='model.pth or a training checkpoint')
+    parser.add_argument('--games', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0, help='run seed the game seeds are derived from')
+    parser.add_argument('--workers', type=int, help='processes, one per core by default')
+    parser.add_argument('--far-danger-distances', action=argparse.BooleanOptionalAction,
+                        help='state uses the far danger distances, as set in agent.py by default')
+    parser.add_argument('--output', help='write the summary to this JSON file')
+    args = parser.parse_args()
+
+    result = evaluate(args.path, args.games, args.seed, args.workers, args.far_danger_distances)
+    print(f'{args.path}: {result["games"]} games at {result["games_per_second"]:.1f} games/s')
+    print(f'Score mean {result["mean_score"]:.2f} median {result["median_score"]:g} '
+          f'p5 {result["p5_score"]:g} p95 {result["p95_score"]:g} max {result["max_score"]}')
+    print(f'Steps per game {result["mean_steps"]:.1f}')
+    print('Deaths ' + ' '.join(f'{cause} {count}' for cause, count in sorted(result['death_causes'].items())))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(result, file, indent=2)
@@ -0,0 +1,168 @@
+import csv
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import multiprocessing as mp
+
+# queued by MetricsWriter.flush()
+FLUSH = object()
+
+
+# appends one record per game to a JSON lines (.jsonl) or CSV (.csv) file from a background thread
+# log() only puts the record on a queue, the writer thread does the formatting and disk writes
+# and flushes the file at most every flush_interval seconds
+# append=True keeps the records already in the file, with games=n only those of the first n games,
+# e.g. a resumed run drops the records of the games it plays again
+class MetricsWriter:
+
+    def __init__(self, path, flush_interval=1.0, append=True, games=None):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.csv = path.endswith('.csv')
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        if append and games is not None:
+            truncate_records(path, games)
+        self.file = open(path, 'a' if append else 'w', newline='')
+        self.records = queue.Queue()
+        self.writer = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer.start()
+
+    def log(self, **record):
+        self.records.put(record)
+
+    # write out everything logged so far without waiting for the flush interval, e.g. once a checkpoint is saved,
+    # so a crash doesn't lose records of games the checkpoint covers
+    def flush(self):
+        self.records.put(FLUSH)
+
+    def close(self):
+        self.records.put(None)
+        self.writer.join()
+        self.file.close()
+
+    def _write_loop(self):
+        csv_writer = None
+        last_flush = time.monotonic()
+        while True:
+            try:
+                record = self.records.get(timeout=self.flush_interval)
+            except queue.Empty:
+                record = ()
+            if record is None:
+                self.file.flush()
+                return
+            if record is FLUSH:
+                record = ()
+                last_flush = -self.flush_interval
+            if record:
+                if not self.csv:
+                    self.file.write(json.dumps(record) + '\n')
+                else:
+                    if csv_writer is None:
+                        # records without a field leave it empty, fields the first record didn't have are left out
+                        csv_writer = csv.DictWriter(self.file, fieldnames=list(record), extrasaction='ignore')
+                        if self.file.tell() == 0:
+                            csv_writer.writeheader()
+                    csv_writer.writerow(record)
+            if time.monotonic() - last_flush >= self.flush_interval:
+                self.file.flush()
+                last_flush = time.monotonic()
+
+
+# rewrites a metrics file without the records of games after `games` (and without a half written last line)
+def truncate_records(path, games):
+    if not os.path.exists(path):
+        return
+    temp_name = path + '.tmp'
+    if path.endswith('.csv'):
+        with open(path, newline='') as file:
+            reader = csv.DictReader(file)
+            rows = [row for row in reader if not row.get('game') or int(row['game']) <= games]
+            fieldnames = reader.fieldnames
+        if fieldnames is None:
+            return
+        with open(temp_name, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(path) as file:
+            lines = [line for line in file if line.endswith('\n') and json.loads(line).get('game', 0) <= games]
+        with open(temp_name, 'w') as file:
+            file.writelines(lines)
+    os.replace(temp_name, path)
+
+
+# every step-th value so a plot never has more than about max_points points, returns (x, y)
+def decimate(values, max_points=1000):
+    step = max(1, len(values) // max_points)
+    x = list(range(0, len(values), step))
+    return x, values[::step]
+
+
+# reads the records a MetricsWriter has written so far, starting at byte offset
+# returns the records and the offset to continue from (only complete lines are read)
+def read_records(path, offset=0):
+    records = []
+    if not os.path.exists(path):
+        return records, offset
+    with open(path) as file:
+        file.seek(offset)
+        for line in iter(file.readline, ''):
+            if not line.endswith('\n'):
+                break
+            offset += len(line.encode())
+            records.append(json.loads(line))
+    return records, offset
+
+
+# live score plot that follows a .jsonl metrics file, redrawn at most once every interval seconds
+# from decimated data, meant to run in its own process (LivePlot) so training never waits on it
+def run_live_plot(path, interval=1.0, max_points=1000):
+    import matplotlib.pyplot as plt
+
+    plt.ion()
+    scores, mean_scores = [], []
+    offset = 0
+    while True:
+        records, offset = read_records(path, offset)
+        if records:
+            scores += [record['score'] for record in records]
+            mean_scores += [record['mean_score'] for record in records]
+
+            plt.clf()
+            plt.title('Training...')
+            plt.xlabel('Number of games')
+            plt.ylabel('Score')
+            plt.plot(*decimate(scores, max_points))
+            plt.plot(*decimate(mean_scores, max_points))
+            plt.ylim(ymin=0)
+            plt.text(len(scores) - 1, scores[-1], str(scores[-1]))
+            plt.text(len(mean_scores) - 1, mean_scores[-1], str(round(mean_scores[-1], 2)))
+        plt.pause(interval)
+
+
+# run_live_plot in a separate process
+class LivePlot:
+
+    def __init__(self, path, interval=1.0, max_points=1000):
+        context = mp.get_context('spawn')
+        self.process = context.Process(target=run_live_plot, args=(path, interval, max_points), daemon=True)
+
+    def start(self):
+        self.process.start()
+        return self
+
+    def stop(self):
+        self.process.terminate()
+        self.process.join()
+
+
+if __name__ == '__main__':
+    # python metrics.py model/metrics.jsonl plots a running (or finished) training run
+    run_live_plot(sys.argv[1] if len(sys.argv) > 1 else os.path.join('model', 'metrics.jsonl'))
@@ -3,6 +3,7 @@ import torch.nn as nn
 import torch.optim as optim
 import torch.nn.functional as F
 import os
+from checkpoint import atomic_save
 
 class Linear_QNet(nn.Module):
     def __init__(self, input_size, hidden_size, output_size):
@@ -15,6 +16,13 @@ class Linear_QNet(nn.Module):
         x = self.linear2(x)
         return x
 
+    # index of the best move for each state, states can be one state or a batch (numpy or tensor)
+    # runs without autograd, so it is cheap enough to call on every move
+    @torch.inference_mode()
+    def best_actions(self, states):
+        states = torch.as_tensor(states, dtype=torch.float)
+        return torch.argmax(self(states), dim=-1).numpy()
+
     def save(self, file_name='model.pth'):
         # create folder to save model
         model_folder_path = './model'
@@ -22,7 +30,7 @@ class Linear_QNet(nn.Module):
             os.makedirs(model_folder_path)
 
         file_name = os.path.join(model_folder_path, file_name)
-        torch.save(self.state_dict(), file_name)
+        atomic_save(self.state_dict(), file_name)
 
 class QTrainer:
     def __init__(self, model, learning_rate, gamma):
@@ -33,12 +41,31 @@ class QTrainer:
 
         # loss function
         self.criterion =nn.MSELoss()
+        # loss of the last train_step, kept as a tensor so reading it costs nothing until it's logged
+        self.loss = None
+
+    # targets for the predicted Q values: Q_new = reward + gamma * max(next predicted Q value),
+    # or just the reward when the game is over, written at each row's own action
+    # one batched forward pass over all next states, no gradient flows through the targets
+    def compute_targets(self, pred, action, reward, state_new, game_over):
+        with torch.no_grad():
+            Q_next = self.model(state_new).max(dim=1).values
+            Q_new = torch.where(game_over, reward, reward + self.gamma * Q_next)
+
+            target = pred.detach().clone()
+            target[torch.arange(len(action)), action] = Q_new
+        return target
 
-    def train_step(self, state, action, reward, state_new, game_over):
-        state = torch.tensor(state, dtype=torch.float)
-        state_new = torch.tensor(state_new, dtype=torch.float)
-        action = torch.tensor(action, dtype=torch.long)
-        reward = torch.tensor(reward, dtype=torch.float)
+    # action can be move indices or one-hot moves [straight, right, left]
+    # weights are optional importance-sampling weights per sample (prioritized replay)
+    # returns the TD errors (target - predicted Q value of the action taken) as a numpy array
+    def train_step(self, state, action, reward, state_new, game_over, weights=None):
+        # accepts numpy arrays/lists from a single move or tensors from the replay memory
+        state = torch.as_tensor(state, dtype=torch.float)
+        state_new = torch.as_tensor(state_new, dtype=torch.float)
+        action = torch.as_tensor(action, dtype=torch.long)
+        reward = torch.as_tensor(reward, dtype=torch.float)
+        game_over = torch.as_tensor(game_over, dtype=torch.bool)
 
         if len(state.shape) == 1:
             state = torch.unsqueeze(state, 0)
@@ -46,24 +73,27 @@ class QTrainer:
             state_new = torch.unsqueeze(state_new, 0)
             action = torch.unsqueeze(action, 0)
             reward = torch.unsqueeze(reward, 0)
-            game_over = (game_over, )
+            game_over = torch.unsqueeze(game_over, 0)
+        if len(action.shape) == 2:
+            action = torch.argmax(action, dim=1)
 
         #1: predicted Q values with current state
         pred = self.model(state)
 
-        target = pred.clone()
-        for i in range(len(game_over)):
-            Q_new = reward[i]
-            if not game_over[i]:
-                Q_new = reward[i] + self.gamma * torch.max(self.model(state_new[i]))
-
-            target[i][torch.argmax(action).item()] = Q_new
-
         #2: predict Q values with next state
         # Reward + gamma * max(next predicted Q value)
+        target = self.compute_targets(pred, action, reward, state_new, game_over)
 
         self.optimizer.zero_grad()
-        loss = self.criterion(target, pred)
+        if weights is None:
+            loss = self.criterion(target, pred)
+        else:
+            # same as the mean squared error, each sample scaled by its weight
+            loss = (weights.unsqueeze(1) * (target - pred) ** 2).mean()
         loss.backward()
 
-        self.optimizer.step()
\ No newline at end of file
+        self.optimizer.step()
+        self.loss = loss.detach()
+
+        rows = torch.arange(len(action))
+        return (target[rows, action] - pred.detach()[rows, action]).numpy()
@@ -0,0 +1,85 @@
+import cProfile
+import os
+import signal
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    # not on windows
+    resource = None
+
+
+# resident memory of this process in bytes: current from /proc on linux, otherwise the peak, None if unknown
+def rss_bytes():
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macos
+    return peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+
+# per phase timings for the training loop, taken on every sample_every-th game only so the
+# other games pay nothing but a bool check per phase
+# the loop calls start_game()/end_game() around each game and, while self.active,
+#     start = time.perf_counter(); <phase>; start = profiler.lap('phase', start)
+# end_game() returns the seconds spent in each phase of a timed game as time_<phase> fields for its metrics record
+# a cProfile capture of the next n games can be requested with request() (or SIGUSR1, see install_signal), the
+# stats are dumped to folder/profile_<first game>-<last game>.prof for pstats, snakeviz and the like
+class TrainingProfiler:
+
+    def __init__(self, sample_every=10, folder='profiles'):
+        self.sample_every = sample_every
+        self.folder = folder
+        self.active = False
+        self.phases = {}
+        # games still to capture with cProfile, and the capture running now
+        self.requested = 0
+        self.profile = None
+        self.remaining = 0
+        self.first_game = 0
+
+    # profile the next `games` games with cProfile
+    def request(self, games):
+        self.requested = games
+
+    # kill -USR1 <pid> profiles the next `games` games of a running training
+    def install_signal(self, games):
+        if hasattr(signal, 'SIGUSR1') and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.request(games))
+
+    def start_game(self, number_of_games):
+        self.active = self.sample_every > 0 and number_of_games % self.sample_every == 0
+        self.phases = {}
+        if self.requested and self.profile is None:
+            self.remaining, self.requested = self.requested, 0
+            self.first_game = number_of_games + 1
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    # add the time since start to phase, returns the time now as the start of the next phase
+    def lap(self, phase, start):
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0) + now - start
+        return now
+
+    # number_of_games is the game that just ended, returns the timings of the game ({} if it wasn't timed)
+    def end_game(self, number_of_games):
+        if self.profile is not None:
+            self.remaining -= 1
+            if self.remaining <= 0:
+                self.profile.disable()
+                os.makedirs(self.folder, exist_ok=True)
+                path = os.path.join(self.folder, f'profile_{self.first_game}-{number_of_games}.prof')
+                self.profile.dump_stats(path)
+                self.profile = None
+                print(f'Profile of games #{self.first_game}-{number_of_games} written to {path}')
+        if not self.active:
+            return {}
+        return {f'time_{phase}': round(seconds, 6) for phase, seconds in self.phases.items()}
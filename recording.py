@@ -0,0 +1,130 @@
+import os
+import struct
+import sys
+from collections import namedtuple
+
+# [straight, right, left] moves by the index stored for them
+MOVES = [[1, 0, 0], [0, 1, 0], [0, 0, 1]]
+
+# episode in the data file: seed, board width and height in pixels, number of moves, then one byte per move
+HEADER = struct.Struct('<QHHI')
+# index entry per episode: where it starts in the data file, its number of moves and its score
+INDEX_ENTRY = struct.Struct('<QII')
+
+Episode = namedtuple('Episode', 'seed, width, height, actions, score')
+
+
+# append-only trajectory file: episodes go to <path>.bin, and one fixed-size entry per episode to <path>.idx,
+# so episode n is found by reading entry n of the index, without going through the data
+# a game is fully described by its seed (SnakeGameAI.reset(seed)), the board size and its moves,
+# a few hundred bytes per game
+# count cuts the file back to its first `count` episodes, e.g. to what the checkpoint a run resumes from had seen,
+# so the games played again after a crash aren't in it twice
+class EpisodeWriter:
+
+    def __init__(self, path, count=None):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.data = open(path + '.bin', 'ab')
+        self.index = open(path + '.idx', 'ab')
+        self.count = self.index.tell() // INDEX_ENTRY.size
+        if count is not None and count < self.count:
+            self.truncate(count)
+
+    # drop every episode from episode id `count` on
+    def truncate(self, count):
+        with open(self.index.name, 'rb') as index:
+            index.seek(count * INDEX_ENTRY.size)
+            offset = INDEX_ENTRY.unpack(index.read(INDEX_ENTRY.size))[0]
+        self.index.truncate(count * INDEX_ENTRY.size)
+        self.data.truncate(offset)
+        # truncate() leaves the position where it was, write() takes the data offset from it
+        self.index.seek(0, os.SEEK_END)
+        self.data.seek(0, os.SEEK_END)
+        self.count = count
+
+    # actions are the move indices of the game (0 straight, 1 right, 2 left), returns the episode id
+    def write(self, seed, width, height, actions, score):
+        offset = self.data.tell()
+        self.data.write(HEADER.pack(seed, width, height, len(actions)))
+        self.data.write(bytes(actions))
+        # the data is on disk before the index points at it
+        self.data.flush()
+        self.index.write(INDEX_ENTRY.pack(offset, len(actions), score))
+        self.index.flush()
+        self.count += 1
+        return self.count - 1
+
+    def close(self):
+        self.data.close()
+        self.index.close()
+
+
+# reads episodes of a trajectory file by id, only the index entry and the episode itself are read
+class EpisodeReader:
+
+    def __init__(self, path):
+        self.data = open(path + '.bin', 'rb')
+        self.index = open(path + '.idx', 'rb')
+
+    def __len__(self):
+        return os.fstat(self.index.fileno()).st_size // INDEX_ENTRY.size
+
+    def __getitem__(self, episode_id):
+        if episode_id < 0:
+            episode_id += len(self)
+        if not 0 <= episode_id < len(self):
+            raise IndexError(f'no episode {episode_id}, the file has {len(self)}')
+        self.index.seek(episode_id * INDEX_ENTRY.size)
+        offset, length, score = INDEX_ENTRY.unpack(self.index.read(INDEX_ENTRY.size))
+        self.data.seek(offset)
+        seed, width, height, length = HEADER.unpack(self.data.read(HEADER.size))
+        return Episode(seed, width, height, self.data.read(length), score)
+
+    # (episode id, number of moves, score) of every episode, from the index only
+    def summaries(self):
+        self.index.seek(0)
+        entries = self.index.read(len(self) * INDEX_ENTRY.size)
+        return [(i, length, score) for i, (_, length, score) in enumerate(INDEX_ENTRY.iter_unpack(entries))]
+
+    def close(self):
+        self.data.close()
+        self.index.close()
+
+
+# plays a recorded episode again through SnakeGameAI, returns the game at its end
+# rendered replays are shown at `fps`, headless ones run as fast as possible (e.g. for analysis)
+# raises ValueError if the game doesn't end with the recorded score after the recorded moves
+def replay(episode, headless=True, fps=30):
+    from SnakeAI import SnakeGameAI
+
+    game = SnakeGameAI(episode.width, episode.height, headless=headless, fps=fps)
+    game.reset(episode.seed)
+    done = False
+    for step, action in enumerate(episode.actions):
+        if done:
+            raise ValueError(f'game ended after {step} of {len(episode.actions)} moves')
+        reward, done, score = game.play_step(MOVES[action])
+    if not done:
+        raise ValueError(f'game still going after all {len(episode.actions)} moves')
+    if game.score != episode.score:
+        raise ValueError(f'replay scored {game.score}, the recorded game {episode.score}')
+    return game
+
+
+if __name__ == '__main__':
+    # python recording.py model/episodes            lists the recorded episodes
+    # python recording.py model/episodes 12         shows episode 12 (best for the highest scoring one)
+    # python recording.py model/episodes 12 --headless only checks that it replays
+    reader = EpisodeReader(sys.argv[1] if len(sys.argv) > 1 else os.path.join('model', 'episodes'))
+    if len(sys.argv) < 3:
+        for episode_id, length, score in reader.summaries():
+            print(f'Episode #{episode_id} Moves: {length} Score: {score}')
+    else:
+        if sys.argv[2] == 'best':
+            episode_id = max(reader.summaries(), key=lambda summary: summary[2])[0]
+        else:
+            episode_id = int(sys.argv[2])
+        game = replay(reader[episode_id], headless='--headless' in sys.argv)
+        print(f'Episode #{episode_id} replayed, score {game.score}')
@@ -0,0 +1,101 @@
+import functools
+import pygame
+
+
+# fonts are loaded from disk once per file and size
+@functools.lru_cache(maxsize=None)
+def load_font(file_name, size):
+    return pygame.font.Font(file_name, size)
+
+
+# draws the snake board with as little work per frame as possible:
+# the title, side panel and grid are drawn once into a background surface, and for every tile color there is a
+# pre-drawn layer of the whole board in that color (grid lines on top, like the games always drew them),
+# so drawing or clearing a tile is a single blit of that tile from a layer or the background
+# only the tiles and text that changed are pushed to the screen, with pygame.display.update(rects) in present()
+# the board is the right part of the window, from x = width - height, tiles are drawn `inset` pixels smaller
+class BoardRenderer:
+
+    def __init__(self, win, width, height, tile_size, inset=0, colors=('green', 'red')):
+        self.win = win
+        self.width = width
+        self.height = height
+        self.offset = width - height
+        self.tile_size = tile_size
+        self.name_font = load_font('Snake Chan.otf', 80)
+        self.score_font = load_font('Azonix.otf', 45)
+
+        self.background = pygame.Surface((width, height))
+        self.background.fill('black')
+        self.background.blit(self.name_font.render("Snake", True, (0, 255, 0)), [40, 50])
+        self.draw_grid(self.background)
+
+        self.layers = {}
+        for color in colors:
+            layer = pygame.Surface((width, height))
+            layer.fill('black')
+            for x in range(self.offset, width, tile_size):
+                for y in range(0, height, tile_size):
+                    layer.fill(color, pygame.Rect(x + inset, y + inset, tile_size - inset, tile_size - inset))
+            self.draw_grid(layer)
+            self.layers[color] = layer
+
+        self.dirty = []
+        self.score = None
+        self.score_rect = None
+        self.food = None
+
+    def draw_grid(self, surface):
+        for x in range(self.offset, self.width, self.tile_size):
+            pygame.draw.line(surface, (50, 50, 50), (x, 0), (x, self.height))
+            pygame.draw.line(surface, (50, 50, 50), (self.offset, x - self.offset), (self.width, x - self.offset))
+        # draw first red line
+        pygame.draw.line(surface, (255, 0, 0), (self.offset, 0), (self.offset, self.height))
+
+    # start over from the empty board, e.g. for a new game
+    def draw_background(self):
+        self.win.blit(self.background, (0, 0))
+        self.dirty = [self.win.get_rect()]
+        self.score = None
+        self.food = None
+
+    # tile with its top left corner at pixel (x, y)
+    def draw_tile(self, x, y, color):
+        rect = pygame.Rect(x, y, self.tile_size, self.tile_size)
+        self.win.blit(self.layers[color], rect, rect)
+        self.dirty.append(rect)
+
+    def clear_tile(self, x, y):
+        rect = pygame.Rect(x, y, self.tile_size, self.tile_size)
+        self.win.blit(self.background, rect, rect)
+        self.dirty.append(rect)
+
+    # food is only drawn when it moved, the tile it left is cleared and returned (None if it didn't move)
+    # so draw the food before the snake, the snake may be on that tile
+    def draw_food(self, x, y, color='red'):
+        if self.food == (x, y):
+            return None
+        left = self.food
+        if left is not None:
+            self.clear_tile(*left)
+        self.food = (x, y)
+        self.draw_tile(x, y, color)
+        return left
+
+    # the score text is only rendered when the score changed
+    def draw_score(self, score):
+        if score == self.score:
+            return
+        self.score = score
+        if self.score_rect is not None:
+            self.win.blit(self.background, self.score_rect, self.score_rect)
+            self.dirty.append(self.score_rect)
+        text = self.score_font.render(f"Score: {score}", True, (255, 255, 255))
+        self.score_rect = self.win.blit(text, [70, 160])
+        self.dirty.append(self.score_rect)
+
+    # push what changed since the last present() to the screen
+    def present(self):
+        if self.dirty:
+            pygame.display.update(self.dirty)
+            self.dirty = []
@@ -0,0 +1,263 @@
+import json
+import os
+import numpy as np
+import torch
+
+
+# array for one column of a memory: plain numpy in RAM, or a memory-mapped .npy file in the folder `path`
+# resume=True maps the existing file as it is (nothing is read or deserialized up front),
+# otherwise a new empty file is created
+def column(path, name, shape, dtype, resume=False):
+    if path is None:
+        return np.zeros(shape, dtype=dtype)
+    file_name = os.path.join(path, name + '.npy')
+    if resume and os.path.exists(file_name):
+        array = np.load(file_name, mmap_mode='r+')
+        if array.shape != shape or array.dtype != dtype:
+            raise ValueError(f'{file_name} holds {array.dtype} {array.shape}, expected {np.dtype(dtype)} {shape}')
+        return array
+    os.makedirs(path, exist_ok=True)
+    return np.lib.format.open_memmap(file_name, mode='w+', dtype=dtype, shape=shape)
+
+
+# names the run whose transitions the memory-mapped columns in a folder hold, see ReplayMemory.owner
+OWNER_FILE = 'owner.json'
+
+
+# replay memory kept column by column in preallocated numpy arrays, used as a ring buffer
+# states are stored as small ints (uint8 for the 0/1 features), actions as the index of the move,
+# so millions of transitions take a few hundred MB instead of gigabytes of python tuples
+# with a path the columns are memory-mapped files there, so a restarted run can reopen them instantly
+# (resume=True), position and size then come back through load_state()
+class ReplayMemory:
+
+    def __init__(self, capacity, state_size, state_dtype=np.uint8, seed=None, path=None, resume=False):
+        self.capacity = capacity
+        self.path = path
+        self.states = column(path, 'states', (capacity, state_size), state_dtype, resume)
+        self.states_new = column(path, 'states_new', (capacity, state_size), state_dtype, resume)
+        self.actions = column(path, 'actions', (capacity,), np.int8, resume)
+        self.rewards = column(path, 'rewards', (capacity,), np.float32, resume)
+        self.games_over = column(path, 'games_over', (capacity,), bool, resume)
+        # next slot to write and number of filled slots
+        self.position = 0
+        self.size = 0
+        self.rng = np.random.default_rng(seed)
+        # fresh columns belong to no run until set_owner()
+        if path is not None and not resume and os.path.exists(os.path.join(path, OWNER_FILE)):
+            os.remove(os.path.join(path, OWNER_FILE))
+
+    # action is the index of the move: 0 straight, 1 right, 2 left
+    # the oldest transition is overwritten once the memory is full
+    def append(self, state, action, reward, state_new, game_over):
+        i = self.position
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.states_new[i] = state_new
+        self.games_over[i] = game_over
+        self.position = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    # append a batch of transitions (arrays with one row per transition)
+    def extend(self, states, actions, rewards, states_new, games_over):
+        count = len(actions)
+        idx = (self.position + np.arange(count)) % self.capacity
+        self.states[idx] = states
+        self.actions[idx] = actions
+        self.rewards[idx] = rewards
+        self.states_new[idx] = states_new
+        self.games_over[idx] = games_over
+        self.position = (self.position + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+
+    # random batch as torch tensors: states, actions, rewards, states_new, games_over
+    # the whole memory is returned while it holds no more than batch_size transitions
+    def sample(self, batch_size):
+        if self.size > batch_size:
+            idx = self.rng.integers(0, self.size, size=batch_size)
+        else:
+            idx = np.arange(self.size)
+        return self.get(idx)
+
+    def get(self, idx):
+        return (torch.from_numpy(self.states[idx]),
+                torch.from_numpy(self.actions[idx]),
+                torch.from_numpy(self.rewards[idx]),
+                torch.from_numpy(self.states_new[idx]),
+                torch.from_numpy(self.games_over[idx]))
+
+    def __len__(self):
+        return self.size
+
+    # bytes taken by the stored transitions (the columns are allocated up front, but untouched pages cost nothing)
+    def nbytes(self):
+        columns = (self.states, self.states_new, self.actions, self.rewards, self.games_over)
+        return self.size * sum(array.itemsize * (array.size // self.capacity) for array in columns)
+
+    # small picklable state that goes into checkpoints, the transitions themselves stay in the columns
+    def state(self):
+        return {'position': self.position, 'size': self.size}
+
+    def load_state(self, state):
+        self.position = state['position']
+        self.size = state['size']
+
+    # forget every transition, for reopened columns no checkpoint gives a position and size for
+    def clear(self):
+        self.position = 0
+        self.size = 0
+
+    # the run the memory-mapped columns belong to, e.g. {'seed': 7, 'run_id': 3}, so a checkpoint of another run
+    # is never restored onto them, {} when unknown (in RAM, or files from before owners were kept)
+    def owner(self):
+        if self.path is None:
+            return {}
+        try:
+            with open(os.path.join(self.path, OWNER_FILE)) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+
+    def set_owner(self, **owner):
+        if self.path is not None:
+            with open(os.path.join(self.path, OWNER_FILE), 'w') as file:
+                json.dump(owner, file)
+
+    # push memory-mapped columns to disk
+    def flush(self):
+        if self.path is not None:
+            for array in (self.states, self.states_new, self.actions, self.rewards, self.games_over):
+                array.flush()
+
+
+# binary sum tree over `capacity` priorities, stored as a flat array: node i has children 2i and 2i+1,
+# the root is node 1 and the leaves start at self.size (capacity rounded up to a power of two)
+# updates and proportional lookups walk one root-to-leaf path, O(log n), and work on whole batches at once
+class SumTree:
+
+    # path/resume keep the tree in a memory-mapped file, like the ReplayMemory columns
+    def __init__(self, capacity, path=None, resume=False):
+        self.size = 1 << max(capacity - 1, 1).bit_length()
+        self.depth = self.size.bit_length() - 1
+        self.tree = column(path, 'priorities', (2 * self.size,), np.float64, resume)
+
+    def total(self):
+        return self.tree[1]
+
+    def get(self, idx):
+        return self.tree[self.size + idx]
+
+    # set one priority, plain python walk up the tree (cheaper than numpy calls for a single leaf)
+    # parents are re-summed from their children so rounding errors don't build up
+    def set(self, i, priority):
+        tree = self.tree
+        node = self.size + i
+        tree[node] = priority
+        node //= 2
+        while node:
+            tree[node] = tree[2 * node] + tree[2 * node + 1]
+            node //= 2
+
+    # set a batch of priorities, one numpy pass per tree level
+    def update(self, idx, priorities):
+        nodes = self.size + np.asarray(idx)
+        self.tree[nodes] = priorities
+        for _ in range(self.depth):
+            nodes = np.unique(nodes // 2)
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+    # zero the priorities of leaves start and up and re-sum their parents
+    def clear(self, start=0):
+        low, high = self.size + start, 2 * self.size
+        self.tree[low:high] = 0
+        while low > 1:
+            low, high = low // 2, high // 2
+            nodes = np.arange(low, high)
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+    # leaf index for each value in [0, total), all values walk down the tree together
+    def find(self, values):
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        for _ in range(self.depth):
+            left = 2 * nodes
+            left_sum = self.tree[left]
+            go_right = values >= left_sum
+            values -= left_sum * go_right
+            nodes = left + go_right
+        return nodes - self.size
+
+
+# replay memory that samples transitions in proportion to their priority (|TD error| + eps) ** alpha
+# new transitions get the highest priority seen so far so every one is trained on at least once
+# sample() also returns the indices to update and importance-sampling weights for the loss,
+# beta grows towards 1 by beta_increment on every sample
+class PrioritizedReplayMemory(ReplayMemory):
+
+    def __init__(self, capacity, state_size, state_dtype=np.uint8, alpha=0.6, beta=0.4,
+                 beta_increment=0.001, eps=0.01, seed=None, path=None, resume=False):
+        super().__init__(capacity, state_size, state_dtype, seed, path, resume)
+        self.alpha = alpha
+        self.beta = beta
+        self.beta_increment = beta_increment
+        self.eps = eps
+        self.priorities = SumTree(capacity, path, resume)
+        self.max_priority = 1.0
+
+    def append(self, state, action, reward, state_new, game_over):
+        self.priorities.set(self.position, self.max_priority)
+        super().append(state, action, reward, state_new, game_over)
+
+    def extend(self, states, actions, rewards, states_new, games_over):
+        idx = (self.position + np.arange(len(actions))) % self.capacity
+        self.priorities.update(idx, self.max_priority)
+        super().extend(states, actions, rewards, states_new, games_over)
+
+    # random batch as torch tensors: states, actions, rewards, states_new, games_over, weights
+    # plus the numpy indices to pass back to update_priorities
+    def sample(self, batch_size):
+        batch_size = min(batch_size, self.size)
+        total = self.priorities.total()
+        # one value in each of batch_size equal slices of the total keeps the batch spread out
+        values = (np.arange(batch_size) + self.rng.random(batch_size)) * (total / batch_size)
+        idx = np.minimum(self.priorities.find(values), self.size - 1)
+
+        probabilities = self.priorities.get(idx) / total
+        weights = (self.size * probabilities) ** -self.beta
+        weights /= weights.max()
+        self.beta = min(1.0, self.beta + self.beta_increment)
+
+        return self.get(idx) + (torch.from_numpy(weights.astype(np.float32)), idx)
+
+    # new priorities from the absolute TD errors of a sampled batch
+    def update_priorities(self, idx, errors):
+        priorities = (np.abs(errors) + self.eps) ** self.alpha
+        self.priorities.update(idx, priorities)
+        self.max_priority = max(self.max_priority, priorities.max())
+
+    def nbytes(self):
+        return super().nbytes() + self.priorities.tree.nbytes
+
+    def state(self):
+        state = super().state()
+        state.update(beta=self.beta, max_priority=self.max_priority)
+        return state
+
+    # reopened priorities also hold leaves written after the checkpoint, the slots past size are empty again
+    # and must not be sampled (a full memory has no such slots)
+    def load_state(self, state):
+        super().load_state(state)
+        self.beta = state['beta']
+        self.max_priority = state['max_priority']
+        if self.size < self.capacity:
+            self.priorities.clear(self.size)
+
+    def clear(self):
+        super().clear()
+        self.priorities.clear()
+
+    def flush(self):
+        super().flush()
+        if self.path is not None:
+            self.priorities.tree.flush()
@@ -0,0 +1,146 @@
+import json
+import sqlite3
+import sys
+import time
+
+RESULTS_DB = 'results.db'
+RESULTS_XLSX = 'Results.xlsx'
+# exports go to a file of their own, Results.xlsx keeps the attempts recorded by hand
+RESULTS_EXPORT = 'Results_export.xlsx'
+
+# runs: one row per training run, the hyperparameters as a JSON object so new ones never need a schema change
+# results: final metrics of a finished run
+# episodes: per game summary of a run (the same fields as the metrics file)
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started REAL NOT NULL,
+    config TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER PRIMARY KEY REFERENCES runs(id),
+    finished REAL NOT NULL,
+    number_of_games INTEGER,
+    highscore INTEGER,
+    mean_score REAL,
+    metrics TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS episodes (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    game INTEGER NOT NULL,
+    score INTEGER,
+    mean_score REAL,
+    epsilon REAL,
+    steps INTEGER,
+    loss REAL,
+    time REAL,
+    PRIMARY KEY (run_id, game)
+);
+'''
+EPISODE_FIELDS = ('game', 'score', 'mean_score', 'epsilon', 'steps', 'loss', 'time')
+# spreadsheet columns before any hyperparameter that Results.xlsx didn't have yet
+CONFIG_COLUMNS = ['MAX_MEMORY', 'BATCH_SIZE', 'LEARNING_RATE', 'max_exploration_rate', 'min_exploration_rate',
+                  'exploration_decay_rate', 'gamma', 'hidden_layers', 'far_dangers']
+RESULT_COLUMNS = ['number_of_games', 'highscore', 'mean_score']
+
+
+# append-only store of training results in an SQLite file, replaces rewriting Results.xlsx after every run
+# every write is one short transaction, the database runs in WAL mode and waits for locks instead of failing,
+# so any number of runs (and processes) can record into the same file at once
+# export_xlsx() rebuilds the spreadsheet from it when it's wanted
+class ResultsStore:
+
+    def __init__(self, path=RESULTS_DB, timeout=60):
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=timeout)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    # new run with its hyperparameters (a dict), returns the run id
+    def start_run(self, config, started=None):
+        with self.connection:
+            cursor = self.connection.execute('INSERT INTO runs (started, config) VALUES (?, ?)',
+                                              (time.time() if started is None else started, json.dumps(config)))
+        return cursor.lastrowid
+
+    # per game records (dicts with the EPISODE_FIELDS), e.g. what train() logs to the metrics file
+    # recording a game twice (after resuming from a checkpoint) keeps the newer record
+    def add_episodes(self, run_id, episodes):
+        rows = [(run_id,) + tuple(episode.get(field) for field in EPISODE_FIELDS) for episode in episodes]
+        with self.connection:
+            self.connection.executemany(f'INSERT OR REPLACE INTO episodes (run_id, {", ".join(EPISODE_FIELDS)}) '
+                                        f'VALUES (?{", ?" * len(EPISODE_FIELDS)})', rows)
+
+    # final metrics of a run, any keys besides number_of_games, highscore and mean_score are kept as JSON
+    def finish_run(self, run_id, finished=None, **metrics):
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO results (run_id, finished, number_of_games, highscore, mean_score, metrics) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (run_id, time.time() if finished is None else finished, metrics.get('number_of_games'),
+                 metrics.get('highscore'), metrics.get('mean_score'), json.dumps(metrics)))
+
+    # (run id, config, metrics) of every run in order, metrics is None for runs that never finished
+    def runs(self):
+        rows = self.connection.execute('SELECT runs.id, runs.config, results.metrics FROM runs '
+                                       'LEFT JOIN results ON results.run_id = runs.id ORDER BY runs.id')
+        return [(run_id, json.loads(config), None if metrics is None else json.loads(metrics))
+                for run_id, config, metrics in rows]
+
+    def episodes(self, run_id):
+        rows = self.connection.execute(f'SELECT {", ".join(EPISODE_FIELDS)} FROM episodes '
+                                       'WHERE run_id = ? ORDER BY game', (run_id,))
+        return [dict(zip(EPISODE_FIELDS, row)) for row in rows]
+
+    # write all runs to a new spreadsheet laid out like Results.xlsx: Attempt, the hyperparameters, the results
+    # hyperparameters and metrics the old sheet didn't know get columns of their own
+    def export_xlsx(self, path=RESULTS_EXPORT):
+        from openpyxl import Workbook
+
+        runs = self.runs()
+        config_columns = list(CONFIG_COLUMNS)
+        result_columns = list(RESULT_COLUMNS)
+        for _, config, metrics in runs:
+            config_columns += [key for key in config if key not in config_columns]
+            result_columns += [key for key in metrics or {} if key not in result_columns]
+
+        book = Workbook()
+        sheet = book.active
+        sheet.append(['Attempt'] + config_columns + result_columns)
+        for run_id, config, metrics in runs:
+            metrics = metrics or {}
+            sheet.append([run_id] + [config.get(key) for key in config_columns]
+                         + [metrics.get(key) for key in result_columns])
+        book.save(path)
+
+    # record the rows of an existing Results.xlsx as runs, e.g. once before the first export
+    def import_xlsx(self, path=RESULTS_XLSX):
+        from openpyxl import load_workbook
+
+        rows = load_workbook(path, read_only=True).active.iter_rows(values_only=True)
+        header = next(rows)
+        for row in rows:
+            values = dict(zip(header, row))
+            if values.get('Attempt') is None:
+                continue
+            run_id = self.start_run({key: values.get(key) for key in header[1:] if key not in RESULT_COLUMNS},
+                                    started=0)
+            if any(values.get(key) is not None for key in RESULT_COLUMNS):
+                self.finish_run(run_id, finished=0, **{key: values.get(key) for key in RESULT_COLUMNS})
+
+
+if __name__ == '__main__':
+    # python results.py export [Results_export.xlsx] writes the spreadsheet from results.db
+    # python results.py import [Results.xlsx] records an existing spreadsheet in results.db
+    command = sys.argv[1] if len(sys.argv) > 1 else 'export'
+    store = ResultsStore()
+    if command == 'import':
+        store.import_xlsx(*sys.argv[2:3])
+    else:
+        store.export_xlsx(*sys.argv[2:3])
+    store.close()
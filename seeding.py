@@ -0,0 +1,40 @@
+import numpy as np
+
+# independent streams of a run: the agent's exploration, replay memory sampling, the games' food
+# and the model's initial weights
+AGENT, MEMORY, GAMES, MODEL = range(4)
+
+
+# a fresh run seed when none is given
+def new_seed():
+    return int(np.random.SeedSequence().generate_state(1, np.uint32)[0])
+
+
+# every random number of a run comes from one run seed through numpy's SeedSequence:
+# stream s of worker w uses SeedSequence(seed, spawn_key=(w, s)), game n of worker w the seed from (w, GAMES, n),
+# so workers, streams and games never share a generator, and a run (or a single game) can be repeated from its seed
+# worker 0 is train() itself or the learner, actors are 1, 2, ...
+class RunSeeds:
+
+    def __init__(self, seed, worker=0):
+        self.seed = seed
+        self.worker = worker
+
+    def sequence(self, *key):
+        return np.random.SeedSequence(self.seed, spawn_key=(self.worker,) + key)
+
+    # numpy generator of one stream
+    def generator(self, stream):
+        return np.random.default_rng(self.sequence(stream))
+
+    # 64 bit integer seed, for things seeded with an int (random.Random, torch.manual_seed)
+    def int_seed(self, *key):
+        return int(self.sequence(*key).generate_state(1, np.uint64)[0])
+
+    # seed for SnakeGameAI.reset of the worker's n-th game
+    def game_seed(self, number_of_games):
+        return self.int_seed(GAMES, number_of_games)
+
+    # the same run seed for another worker
+    def for_worker(self, worker):
+        return RunSeeds(self.seed, worker)
@@ -1,6 +1,7 @@
 import pygame as pygame
 import sys
 import random
+from renderer import BoardRenderer
 
 vec2 = pygame.math.Vector2
 
@@ -127,6 +128,8 @@ class Game:
         self.OFFSET = self.WIDTH - self.HEIGHT
         self.TILE_SIZE = 40
         self.win = pygame.display.set_mode((self.WIDTH, self.HEIGHT))
+        # snake and food are drawn 2 pixels inside their tiles
+        self.renderer = BoardRenderer(self.win, self.WIDTH, self.HEIGHT, self.TILE_SIZE, inset=2)
 
         self.clock = pygame.time.Clock()
         self.grid_list = [[x, y] for x in range(self.OFFSET, self.WIDTH, self.TILE_SIZE)
@@ -137,36 +140,33 @@ class Game:
     def new_game(self):
         self.snake = Snake(self)
         self.food = Food(self, self.snake)
-
-    def draw_grid(self):
-        for x in range(self.OFFSET, self.WIDTH, self.TILE_SIZE):
-            pygame.draw.line(self.win, (50, 50, 50), (x, 0), (x, self.HEIGHT))
-            pygame.draw.line(self.win, (50, 50, 50), (self.OFFSET, x - self.OFFSET), (self.WIDTH, x - self.OFFSET))
-        # draw first red line
-        pygame.draw.line(self.win, (255, 0, 0), (self.OFFSET, 0), (self.OFFSET, self.HEIGHT))
-
-    def draw_name(self):
-        name_font = pygame.font.Font('Snake Chan.otf', 80)
-        name_text = name_font.render("Snake", True, (0, 255, 0))
-        self.win.blit(name_text, [40, 50])
-
-    def draw_score(self):
-        score_font = pygame.font.Font('Azonix.otf', 45)
-        score_text = score_font.render(f"Score: {self.snake.length}", True, (255, 255, 255))
-        self.win.blit(score_text, [70, 160])
+        # top left corners of the snake tiles on screen, the next draw() starts from an empty board
+        self.drawn = set()
+        self.redraw = True
 
     def update(self):
         self.snake.update()
-        pygame.display.flip()
+        self.renderer.present()
         self.clock.tick(160)
 
+    # only the tiles the snake entered or left since the last frame are drawn, and the score when it changed
     def draw(self):
-        self.win.fill('black')
-        self.draw_name()
-        self.draw_grid()
-        self.draw_score()
-        self.food.draw()
-        self.snake.draw()
+        renderer = self.renderer
+        if self.redraw:
+            renderer.draw_background()
+            self.redraw = False
+        tiles = {(segment.x - 2, segment.y - 2) for segment in self.snake.segments}
+        for x, y in self.drawn - tiles:
+            renderer.clear_tile(x, y)
+        changed = tiles - self.drawn
+        # the tile the food left is cleared, the snake may still be on it
+        left = renderer.draw_food(self.food.rect.x - 2, self.food.rect.y - 2)
+        if left in tiles:
+            changed.add(left)
+        for x, y in changed:
+            renderer.draw_tile(x, y, 'green')
+        self.drawn = tiles
+        renderer.draw_score(self.snake.length)
 
     def check_event(self):
         for event in pygame.event.get():
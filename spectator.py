@@ -0,0 +1,104 @@
+import queue
+import multiprocessing as mp
+from array import array
+from collections import deque
+
+
+# spectator process: plays the episodes it is sent in a window of its own at `fps` frames a second
+# an episode is (number of the game, score, frames), frames holds the head tile and the food tile after every step,
+# the first pair being the start of the game, the body is rebuilt from the heads (it grows when the head reaches food)
+def run_spectator(episodes, width, height, fps):
+    import pygame
+    from renderer import BoardRenderer
+
+    tile_size = 40
+    offset = width - height
+    cols = height // tile_size
+    pygame.init()
+    win = pygame.display.set_mode((width, height))
+    clock = pygame.time.Clock()
+    renderer = BoardRenderer(win, width, height, tile_size)
+
+    def point(tile):
+        row, col = divmod(tile, cols)
+        return offset + col * tile_size, row * tile_size
+
+    while True:
+        try:
+            number_of_games, score, frames = episodes.get(timeout=0.1)
+        except queue.Empty:
+            frames = None
+        if frames is None:
+            if any(event.type == pygame.QUIT for event in pygame.event.get()):
+                return
+            continue
+
+        pygame.display.set_caption(f'SnakeAI spectator - game #{number_of_games} - score {score}')
+        renderer.draw_background()
+        snake = deque([frames[0]])
+        food = frames[1]
+        renderer.draw_food(*point(food))
+        renderer.draw_tile(*point(frames[0]), 'green')
+        renderer.draw_score(0)
+        renderer.present()
+        for i in range(2, len(frames), 2):
+            head, new_food = frames[i], frames[i + 1]
+            if head != food:
+                renderer.clear_tile(*point(snake.pop()))
+            snake.appendleft(head)
+            food = new_food
+            renderer.draw_food(*point(food))
+            renderer.draw_tile(*point(head), 'green')
+            renderer.draw_score(len(snake) - 1)
+            renderer.present()
+            clock.tick(fps)
+            if any(event.type == pygame.QUIT for event in pygame.event.get()):
+                return
+
+
+# lets training be watched without rendering it: the game's head and food tiles are recorded after every step
+# (two array appends), and whole episodes are handed to a spectator process once they are over
+# every=n shows every n-th game, highscores=True every game that set a new highscore
+# episodes are dropped when the spectator is still busy, and once its window is closed nothing is sent any more,
+# so training never waits on it
+class Spectator:
+
+    def __init__(self, every=0, highscores=True, fps=30, width=1200, height=800, backlog=2):
+        self.every = every
+        self.highscores = highscores
+        self.highscore = 0
+        self.frames = array('H')
+        context = mp.get_context('spawn')
+        self.episodes = context.Queue(maxsize=backlog)
+        self.process = context.Process(target=run_spectator, args=(self.episodes, width, height, fps), daemon=True)
+
+    def start(self):
+        self.process.start()
+        return self
+
+    def stop(self):
+        self.process.terminate()
+        self.process.join()
+
+    # a game (re)started
+    def start_episode(self, game):
+        self.frames = array('H', (game.head_row * game.COLS + game.head_col, game.food_row * game.COLS + game.food_col))
+
+    # after every step of the game that didn't end it
+    def record(self, game):
+        frames = self.frames
+        frames.append(game.head_row * game.COLS + game.head_col)
+        frames.append(game.food_row * game.COLS + game.food_col)
+
+    # the game ended, send it if it is one to show
+    def end_episode(self, number_of_games, score):
+        highscore = score > self.highscore
+        self.highscore = max(self.highscore, score)
+        if not (highscore and self.highscores or self.every and number_of_games % self.every == 0):
+            return
+        if not self.process.is_alive():
+            return
+        try:
+            self.episodes.put_nowait((number_of_games, score, self.frames))
+        except queue.Full:
+            pass
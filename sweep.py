@@ -0,0 +1,150 @@
+import itertools
+import math
+import os
+import random
+import sys
+import time
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import replace
+
+SWEEP_FOLDER = os.path.join('model', 'sweep')
+
+
+# every combination of the values in space, e.g. {'LEARNING_RATE': [0.001, 0.002], 'gamma': [0.8, 0.9]}
+def grid(space):
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+# `trials` random points of space: a list is picked from, a (low, high) tuple is drawn uniformly
+# (ints for int bounds), a (low, high, 'log') tuple is drawn log-uniformly
+def random_search(space, trials, seed=None):
+    rng = random.Random(seed)
+
+    def draw(values):
+        if isinstance(values, list):
+            return rng.choice(values)
+        low, high = values[:2]
+        if values[2:] == ('log',):
+            return type(low)(10 ** rng.uniform(math.log10(low), math.log10(high)))
+        if isinstance(low, int) and isinstance(high, int):
+            return rng.randint(low, high)
+        return rng.uniform(low, high)
+
+    return [{name: draw(values) for name, values in space.items()} for _ in range(trials)]
+
+
+# pins torch to `threads` threads in a pool process, so the trials running side by side don't fight over cores
+def pin_threads(threads):
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    import torch
+    torch.set_num_threads(threads)
+
+
+# one trial in a pool process: train() with the default config changed by params, in the trial's own folder
+def run_trial(trial, params, folder, resume=False):
+    import agent
+
+    config = replace(agent.default_config(), **params)
+    agent.PRINT_EVERY = sys.maxsize
+    result = agent.train(resume=resume, config=config, folder=folder)
+    return dict(trial=trial, params=params, folder=folder, **result)
+
+
+# new folder for a sweep's trials, so trials never resume from the checkpoints of an earlier sweep
+def new_sweep_folder():
+    return os.path.join(SWEEP_FOLDER, time.strftime('%Y%m%d-%H%M%S'))
+
+
+# process pool for trials: `workers` processes (defaults to as many as fit on the cores) of `threads` torch threads
+def trial_pool(workers=None, threads=1):
+    if workers is None:
+        workers = max(1, (os.cpu_count() or 1) // threads)
+    context = mp.get_context('spawn')
+    return ProcessPoolExecutor(workers, mp_context=context, initializer=pin_threads, initargs=(threads,))
+
+
+# runs (trial, params, folder, resume) jobs on the pool, returns {trial: result} once all are done
+def run_trials(pool, jobs):
+    futures = {pool.submit(run_trial, *job): job[0] for job in jobs}
+    results = {}
+    for future in as_completed(futures):
+        result = future.result()
+        results[futures[future]] = result
+        print(f'Trial #{result["trial"]} {result["params"]} Games: {result["number_of_games"]} '
+              f'Highscore: {result["highscore"]} Mean Score: {result["mean_score"]}')
+    return results
+
+
+def trial_folder(folder, trial):
+    return os.path.join(folder, f'trial_{trial:03d}')
+
+
+# runs every params dict of `trials` (see grid and random_search) as its own training run, `workers` at a time,
+# with `threads` torch threads each
+# each trial trains in folder/trial_<n> and is recorded in the results store like any other run
+# returns one result per trial, in the order the trials were given
+def sweep(trials, workers=None, threads=1, folder=None):
+    folder = folder or new_sweep_folder()
+    with trial_pool(workers, threads) as pool:
+        jobs = [(trial, params, trial_folder(folder, trial)) for trial, params in enumerate(trials)]
+        results = run_trials(pool, jobs)
+    return [results[trial] for trial in range(len(trials))]
+
+
+# successive halving: every trial trains for about min_games games, then only the best 1/eta of them by mean score
+# carry on to eta times as many games (resuming from their last checkpoint), and so on up to max_games
+# the games of a rung are max_games / eta ** (rungs left), so the last rung is exactly max_games and the first
+# one at least min_games (the extra few games of a rounded-up schedule would cost a whole round of resumes)
+# bad configurations are stopped early and the games go to the promising ones
+# returns the last result of every trial, result['rung'] is the last rung (0 = stopped after min_games) it reached
+def successive_halving(trials, min_games=100, max_games=400, eta=2, workers=None, threads=1, folder=None):
+    folder = folder or new_sweep_folder()
+    results = [None] * len(trials)
+    alive = list(range(len(trials)))
+    rungs = int(math.log(max_games / min_games, eta) + 1e-9) if min_games < max_games else 0
+    rung = 0
+    games = max(1, round(max_games / eta ** rungs))
+    with trial_pool(workers, threads) as pool:
+        while True:
+            jobs = [(trial, dict(trials[trial], max_games=games), trial_folder(folder, trial), rung > 0)
+                    for trial in alive]
+            for trial, result in run_trials(pool, jobs).items():
+                results[trial] = dict(result, rung=rung)
+            if rung == rungs:
+                return results
+
+            alive.sort(key=lambda trial: results[trial]['mean_score'], reverse=True)
+            alive = alive[:max(1, len(alive) // eta)]
+            rung += 1
+            games = max(1, round(max_games / eta ** (rungs - rung)))
+            print(f'Rung {rung}: {len(alive)} trials continue to {games} games')
+
+
+# hyperband: successive halving brackets over random configurations of space, from many trials stopped
+# after few games to a few trials that all play max_games, so it also works when early scores mislead
+# returns the results of all brackets
+def hyperband(space, max_games=400, min_games=25, eta=3, workers=None, threads=1, folder=None, seed=None):
+    folder = folder or new_sweep_folder()
+    rng = random.Random(seed)
+    brackets = int(math.log(max_games / min_games, eta) + 1e-9)
+    results = []
+    for bracket in range(brackets, -1, -1):
+        trials = math.ceil((brackets + 1) / (bracket + 1) * eta ** bracket)
+        # not rounded, so successive halving gives the bracket exactly `bracket` rungs after the first
+        games = max_games / eta ** bracket
+        results += successive_halving(random_search(space, trials, rng.random()), games, max_games, eta,
+                                      workers, threads, os.path.join(folder, f'bracket_{bracket}'))
+    return results
+
+
+if __name__ == '__main__':
+    # python sweep.py halving stops the weak half of the grid after 100 and 200 games
+    space = {'LEARNING_RATE': [0.001, 0.002], 'gamma': [0.8, 0.9], 'hidden_layers': [450, 1000]}
+    if 'halving' in sys.argv:
+        results = successive_halving(grid(space))
+    else:
+        results = sweep(grid(space))
+    for result in sorted(results, key=lambda result: (result.get('rung', 0), result['mean_score']), reverse=True):
+        print(result)